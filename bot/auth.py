@@ -0,0 +1,51 @@
+"""
+Access control for Telegram Cafe Bot handlers
+"""
+
+import functools
+from typing import Any, Collection, Dict, Optional, Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+
+from db_async import DIRECTOR_ID
+
+DENIED_TEXT = "⛔ Нет доступа"
+
+
+async def _deny(event, kwargs: Dict[str, Any], message_text: Optional[str]):
+    """Tell the sender they have no access"""
+    if isinstance(event, CallbackQuery):
+        callback_answer = kwargs.get("callback_answer")
+        if callback_answer is not None:
+            callback_answer.text = DENIED_TEXT
+            callback_answer.show_alert = True
+        else:
+            await event.answer(DENIED_TEXT, show_alert=True)
+    elif message_text:
+        await event.answer(message_text)
+
+
+def require_role(roles: Collection[str], *, message_text: Optional[str] = None):
+    """Run the handler only for senders whose role is in roles.
+    The handler must accept `role` (set by RoleMiddleware) as a keyword, and
+    callback handlers under CallbackAnswerMiddleware also `callback_answer`.
+    Denied callbacks get an alert; denied messages get message_text, or nothing"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(event, *args, **kwargs):
+            if kwargs.get("role") in roles:
+                return await handler(event, *args, **kwargs)
+            await _deny(event, kwargs, message_text)
+        return wrapper
+    return decorator
+
+
+class IsDirector(BaseFilter):
+    """Passes updates sent by DIRECTOR_ID; meant as a router-level filter"""
+
+    def __init__(self):
+        self.director_id = DIRECTOR_ID
+
+    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+        return event.from_user.id == self.director_id
@@ -0,0 +1,112 @@
+"""
+In-process caches for Telegram Cafe Bot
+Copies of lookups that staff handlers repeat on every click
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from database import menu_version
+from db_async import (
+    get_users_by_role, get_staff_users, get_categories, get_menu_items, DIRECTOR_ID
+)
+
+STAFF_TTL = 60
+
+
+class StaffListCache:
+    """A list of users, reloaded at most once per ttl seconds"""
+
+    __slots__ = ("ttl", "_load", "_users", "_loaded_at")
+
+    def __init__(self, load: Callable[[], Awaitable[List[Dict[str, Any]]]],
+                 ttl: float = STAFF_TTL):
+        self.ttl = ttl
+        self._load = load
+        self._users: Optional[List[Dict[str, Any]]] = None
+        self._loaded_at = 0.0
+
+    async def get(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        if self._users is None or now - self._loaded_at >= self.ttl:
+            self._users = await self._load()
+            self._loaded_at = now
+        return self._users
+
+    def invalidate(self):
+        self._users = None
+
+
+couriers_cache = StaffListCache(lambda: get_users_by_role('courier'))
+staff_cache = StaffListCache(lambda: get_staff_users(DIRECTOR_ID))
+
+
+async def list_couriers() -> List[Dict[str, Any]]:
+    """Get couriers for assignment keyboards"""
+    return await couriers_cache.get()
+
+
+async def list_staff() -> List[Dict[str, Any]]:
+    """Get the director, admins and couriers for the director's role screens"""
+    return await staff_cache.get()
+
+
+def invalidate_staff():
+    """Drop the staff lists, e.g. after the director changes someone's role"""
+    couriers_cache.invalidate()
+    staff_cache.invalidate()
+
+
+class MenuCache:
+    """Categories and menu items for the current menu version.
+    Repeat reads skip the worker thread; any menu write in database.py bumps
+    the version and the next read reloads. Returned lists are shared, don't mutate them"""
+
+    __slots__ = ("_version", "_categories", "_items")
+
+    def __init__(self):
+        self._version = -1
+        self._categories: Optional[List[Dict[str, Any]]] = None
+        self._items: Dict[Optional[int], List[Dict[str, Any]]] = {}
+
+    def _sync(self) -> int:
+        version = menu_version()
+        if version != self._version:
+            self._version = version
+            self._categories = None
+            self._items.clear()
+        return version
+
+    async def categories(self) -> List[Dict[str, Any]]:
+        version = self._sync()
+        if self._categories is not None:
+            return self._categories
+        categories = await get_categories()
+        # Don't store a result loaded before a concurrent menu change
+        if version == self._version:
+            self._categories = categories
+        return categories
+
+    async def items(self, category_id: int = None) -> List[Dict[str, Any]]:
+        version = self._sync()
+        category_id = category_id or None
+        items = self._items.get(category_id)
+        if items is not None:
+            return items
+        items = await get_menu_items(category_id)
+        if version == self._version:
+            self._items[category_id] = items
+        return items
+
+
+menu_cache = MenuCache()
+
+
+async def get_categories_cached() -> List[Dict[str, Any]]:
+    """Get active categories without a database round trip when unchanged"""
+    return await menu_cache.categories()
+
+
+async def get_menu_items_cached(category_id: int = None) -> List[Dict[str, Any]]:
+    """Get available menu items without a database round trip when unchanged"""
+    return await menu_cache.items(category_id)
@@ -0,0 +1,36 @@
+"""
+Callback data factories for Telegram Cafe Bot
+Typed callback_data for order buttons. Each factory packs to the same
+prefix:action:... string the buttons used before, so inline keyboards
+already sent to chats keep working
+"""
+
+from typing import Literal
+
+from aiogram.filters.callback_data import CallbackData
+
+
+class OrderViewCB(CallbackData, prefix="admin"):
+    """Open order card in admin panel: admin:view_order:<order_id>"""
+    action: Literal["view_order"] = "view_order"
+    order_id: int
+
+
+class OrderStatusCB(CallbackData, prefix="admin"):
+    """Change order status: admin:order_status:<order_id>:<status>"""
+    action: Literal["order_status"] = "order_status"
+    order_id: int
+    status: str
+
+
+class AssignCourierCB(CallbackData, prefix="admin"):
+    """Assign courier to order: admin:assign_courier:<order_id>:<courier_id>"""
+    action: Literal["assign_courier"] = "assign_courier"
+    order_id: int
+    courier_id: int
+
+
+class CourierCB(CallbackData, prefix="courier"):
+    """Courier order card buttons: courier:<action>:<order_id>"""
+    action: Literal["view", "pickup", "delivered", "address", "call"]
+    order_id: int
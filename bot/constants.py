@@ -0,0 +1,20 @@
+"""
+Shared constants for Telegram Cafe Bot
+"""
+
+from types import MappingProxyType
+
+# Order status translations for staff views (read-only, shared by handlers)
+STATUS_NAMES = MappingProxyType({
+    'pending': '⏳ Ожидает',
+    'confirmed': '✅ Подтверждён',
+    'cooking': '👨‍🍳 Готовится',
+    'ready': '📦 Готов к доставке',
+    'delivering': '🚚 Доставляется',
+    'delivered': '✅ Доставлен',
+    'cancelled': '❌ Отменён'
+})
+
+# Roles allowed into the admin and courier panels
+ADMIN_ROLES = frozenset({'admin', 'director'})
+COURIER_ROLES = frozenset({'courier', 'admin', 'director'})
@@ -4,26 +4,74 @@ SQLite database with users, orders, and menu management
 """
 
 import sqlite3
-import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple, Union, BinaryIO
+import io
 import os
 
-DATABASE_PATH = os.path.join(os.path.dirname(__file__), "cafe_bot.db")
-DIRECTOR_ID = int(os.getenv("DIRECTOR_ID", "7559519281"))
+import orjson
 
+from db_pool import ConnectionPool
+
+# ":memory:" keeps the whole database in RAM, shared by all pooled connections
+DATABASE_PATH = os.getenv("DATABASE_PATH") or os.path.join(os.path.dirname(__file__), "cafe_bot.db")
+# No fallback: a default id would hand director rights to whoever owns it
+if not os.getenv("DIRECTOR_ID"):
+    raise RuntimeError("DIRECTOR_ID is not set in environment variables")
+DIRECTOR_ID = int(os.environ["DIRECTOR_ID"])
+
+pool = ConnectionPool(DATABASE_PATH)
+
+# Bump when init_db gains new tables, indexes or migrations
+SCHEMA_VERSION = 4
+
+# Share of the order total credited back to the customer on delivery
+CASHBACK_PERCENT = 5
+
+# Allowed values, mirroring the CHECK constraints in init_db
+_VALID_ROLES = frozenset({'director', 'admin', 'courier', 'user'})
+_VALID_ORDER_STATUSES = frozenset({'pending', 'confirmed', 'cooking', 'ready', 'delivering', 'delivered', 'cancelled'})
+_VALID_PAYMENT_STATUSES = frozenset({'pending', 'paid', 'failed', 'refunded'})
+
+SQL_INSERT_DIRECTOR = """
+    INSERT OR IGNORE INTO users (telegram_id, role, balance_bonus)
+    VALUES (?, 'director', 0)
+"""
+
+
+class _PoolCtx:
+    """Context manager for pooled database connections"""
+    __slots__ = ("readonly", "conn")
+
+    def __init__(self, readonly: bool):
+        self.readonly = readonly
+        self.conn = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn = pool.acquire(self.readonly)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                try:
+                    self.conn.commit()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+            else:
+                self.conn.rollback()
+        finally:
+            pool.release(self.conn, self.readonly)
 
-@contextmanager
-def get_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    finally:
-        conn.close()
+
+def get_connection(readonly: bool = False) -> _PoolCtx:
+    """Borrow a pooled connection; commits on success, rolls back on error"""
+    return _PoolCtx(readonly)
 
 
 def init_db():
@@ -31,6 +79,18 @@ def init_db():
     with get_connection() as conn:
         cursor = conn.cursor()
         
+        # WAL lets readers work alongside the writer and halves fsyncs per commit;
+        # the rest of the tuning is applied by the pool to every connection
+        cursor.execute("PRAGMA journal_mode=WAL")
+        if cursor.fetchone()[0] != 'wal' and not pool.in_memory:
+            print("Warning: SQLite WAL mode is not available, using default journal")
+        
+        # Schema and seed data are already in place; only the director comes from env
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            cursor.execute(SQL_INSERT_DIRECTOR, (DIRECTOR_ID,))
+            return
+        
         # Users table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -53,10 +113,10 @@ def init_db():
             CREATE TABLE IF NOT EXISTS orders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
-                items TEXT NOT NULL,
                 total_price INTEGER NOT NULL,
                 bonus_used INTEGER DEFAULT 0,
                 cashback_used INTEGER DEFAULT 0,
+                cashback_amount INTEGER NOT NULL DEFAULT 0,
                 delivery_address TEXT NOT NULL,
                 status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'confirmed', 'cooking', 'ready', 'delivering', 'delivered', 'cancelled')),
                 courier_id INTEGER,
@@ -69,6 +129,81 @@ def init_db():
             )
         """)
         
+        # Order line items; name and price are snapshots taken when the order is placed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_id INTEGER NOT NULL,
+                menu_item_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                qty INTEGER NOT NULL,
+                unit_price INTEGER NOT NULL,
+                line_no INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (order_id, menu_item_id),
+                FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        
+        # Lines keep their position in the order; rows written before line_no existed
+        # get id'd lines first, then id-less ones (negative keys) in their original order
+        item_columns = [row[1] for row in cursor.execute("PRAGMA table_info(order_items)")]
+        if 'line_no' not in item_columns:
+            cursor.execute("ALTER TABLE order_items ADD COLUMN line_no INTEGER NOT NULL DEFAULT 0")
+            cursor.execute("""
+                UPDATE order_items SET line_no = numbered.line_no
+                FROM (SELECT order_id, menu_item_id,
+                             ROW_NUMBER() OVER (
+                                 PARTITION BY order_id
+                                 ORDER BY menu_item_id < 0, ABS(menu_item_id)) - 1 AS line_no
+                      FROM order_items) AS numbered
+                WHERE order_items.order_id = numbered.order_id
+                  AND order_items.menu_item_id = numbered.menu_item_id
+            """)
+            conn.commit()
+        
+        # Move items of orders created before order_items existed out of orders.items JSON
+        order_columns = [row[1] for row in cursor.execute("PRAGMA table_info(orders)")]
+        if 'items' in order_columns:
+            legacy_lines = """
+                SELECT COUNT(*), TOTAL(COALESCE(json_extract(j.value, '$.quantity'), 1))
+                FROM orders o, json_each(o.items) j
+            """
+            migrated_lines = "SELECT COUNT(*), TOTAL(qty) FROM order_items"
+            expected = cursor.execute(legacy_lines).fetchone()
+            before = cursor.execute(migrated_lines).fetchone()
+            # Every line gets its own row: the first line with a given id keeps it,
+            # lines without an id or repeating one get a negative key unique in the
+            # order (-1 - line index), so no line is merged into another
+            cursor.execute("""
+                INSERT INTO order_items (order_id, menu_item_id, name, qty, unit_price, line_no)
+                SELECT o.id,
+                       CASE WHEN json_extract(j.value, '$.id') IS NOT NULL AND j.key = (
+                                SELECT MIN(j2.key) FROM json_each(o.items) j2
+                                WHERE json_extract(j2.value, '$.id') = json_extract(j.value, '$.id'))
+                            THEN json_extract(j.value, '$.id')
+                            ELSE -1 - j.key
+                       END,
+                       COALESCE(json_extract(j.value, '$.name'), ''),
+                       COALESCE(json_extract(j.value, '$.quantity'), 1),
+                       COALESCE(json_extract(j.value, '$.price'), 0),
+                       j.key
+                FROM orders o, json_each(o.items) j
+            """)
+            after = cursor.execute(migrated_lines).fetchone()
+            # The source column is dropped below, so only drop it if nothing was lost
+            if (after[0] - before[0], after[1] - before[1]) != tuple(expected):
+                raise RuntimeError(
+                    f"Order items migration mismatch: expected {expected[0]} lines / "
+                    f"{expected[1]:g} qty, got {after[0] - before[0]} / {after[1] - before[1]:g}"
+                )
+            cursor.execute("ALTER TABLE orders DROP COLUMN items")
+            conn.commit()
+        
+        # Cashback is fixed when the order is placed; backfill orders created before that
+        if 'cashback_amount' not in order_columns:
+            cursor.execute("ALTER TABLE orders ADD COLUMN cashback_amount INTEGER NOT NULL DEFAULT 0")
+            cursor.execute("UPDATE orders SET cashback_amount = total_price * ? / 100", (CASHBACK_PERCENT,))
+            conn.commit()
+        
         # Menu categories table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS categories (
@@ -112,11 +247,23 @@ def init_db():
             )
         """)
         
-        # Insert director on first run
+        # Indexes for the hot order and menu lookups
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_courier_status ON orders(courier_id, status)")
         cursor.execute("""
-            INSERT OR IGNORE INTO users (telegram_id, role, balance_bonus)
-            VALUES (?, 'director', 0)
-        """, (DIRECTOR_ID,))
+            CREATE INDEX IF NOT EXISTS idx_orders_active ON orders(status)
+            WHERE status NOT IN ('delivered', 'cancelled')
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_menu ON order_items(menu_item_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_menu_cat_avail_sort ON menu_items(category_id, is_available, sort_order)")
+        
+        # Seed everything in one write transaction instead of one per INSERT;
+        # IMMEDIATE takes the write lock up front so another process can't interleave
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Insert director on first run
+        cursor.execute(SQL_INSERT_DIRECTOR, (DIRECTOR_ID,))
         
         # Insert default categories if not exist
         default_categories = [
@@ -127,71 +274,224 @@ def init_db():
             ('Напитки', '🥤', 5),
         ]
         
-        for name, emoji, order in default_categories:
-            cursor.execute("""
-                INSERT OR IGNORE INTO categories (name, emoji, sort_order)
-                VALUES (?, ?, ?)
-            """, (name, emoji, order))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO categories (name, emoji, sort_order)
+            VALUES (?, ?, ?)
+        """, default_categories)
         
-        # Insert sample menu items if table is empty
-        cursor.execute("SELECT COUNT(*) FROM menu_items")
-        if cursor.fetchone()[0] == 0:
-            sample_items = [
-                # Завтраки
-                (1, 'Яичница с беконом', 'Два яйца, хрустящий бекон, тост', 350, None, 1, 0),
-                (1, 'Овсянка с ягодами', 'Овсянка на молоке с сезонными ягодами', 280, None, 1, 1),
-                (1, 'Сырники со сметаной', 'Домашние сырники, 4 шт.', 320, None, 1, 0),
-                # Закуски
-                (2, 'Брускетта с томатами', 'Хрустящий хлеб, томаты, базилик', 290, None, 1, 0),
-                (2, 'Куриные наггетсы', '8 штук с соусом на выбор', 340, None, 1, 0),
-                (2, 'Сырные палочки', '6 штук с томатным соусом', 310, None, 1, 1),
-                # Салаты
-                (3, 'Цезарь с курицей', 'Классический рецепт с соусом Цезарь', 420, None, 1, 0),
-                (3, 'Греческий салат', 'Свежие овощи, сыр фета, оливки', 380, None, 1, 0),
-                (3, 'Салат с тунцом', 'Тунец, микс салата, яйцо', 450, None, 1, 1),
-                # Основные
-                (4, 'Паста Карбонара', 'Спагетти, бекон, сливочный соус', 480, None, 1, 0),
-                (4, 'Стейк из говядины', '250г с овощами гриль', 890, None, 1, 0),
-                (4, 'Куриная грудка гриль', 'С картофельным пюре', 520, None, 1, 0),
-                (4, 'Борщ украинский', 'С пампушками и сметаной', 350, None, 1, 0),
-                # Напитки
-                (5, 'Американо', 'Классический эспрессо с водой', 180, None, 1, 0),
-                (5, 'Капучино', 'Эспрессо с молочной пенкой', 220, None, 1, 0),
-                (5, 'Свежевыжатый сок', 'Апельсин/Яблоко/Морковь', 250, None, 1, 0),
-                (5, 'Лимонад домашний', 'С лимоном и мятой', 200, None, 1, 1),
-            ]
-            
-            for item in sample_items:
-                cursor.execute("""
-                    INSERT INTO menu_items (category_id, name, description, price, image_url, is_available, is_new)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, item)
+        # Insert sample menu items if table is empty; rows reference categories
+        # by name and are resolved to ids in the same statement
+        sample_items = [
+            # Завтраки
+            ('Завтраки', 'Яичница с беконом', 'Два яйца, хрустящий бекон, тост', 350, 0),
+            ('Завтраки', 'Овсянка с ягодами', 'Овсянка на молоке с сезонными ягодами', 280, 1),
+            ('Завтраки', 'Сырники со сметаной', 'Домашние сырники, 4 шт.', 320, 0),
+            # Закуски
+            ('Закуски', 'Брускетта с томатами', 'Хрустящий хлеб, томаты, базилик', 290, 0),
+            ('Закуски', 'Куриные наггетсы', '8 штук с соусом на выбор', 340, 0),
+            ('Закуски', 'Сырные палочки', '6 штук с томатным соусом', 310, 1),
+            # Салаты
+            ('Салаты', 'Цезарь с курицей', 'Классический рецепт с соусом Цезарь', 420, 0),
+            ('Салаты', 'Греческий салат', 'Свежие овощи, сыр фета, оливки', 380, 0),
+            ('Салаты', 'Салат с тунцом', 'Тунец, микс салата, яйцо', 450, 1),
+            # Основные
+            ('Основные', 'Паста Карбонара', 'Спагетти, бекон, сливочный соус', 480, 0),
+            ('Основные', 'Стейк из говядины', '250г с овощами гриль', 890, 0),
+            ('Основные', 'Куриная грудка гриль', 'С картофельным пюре', 520, 0),
+            ('Основные', 'Борщ украинский', 'С пампушками и сметаной', 350, 0),
+            # Напитки
+            ('Напитки', 'Американо', 'Классический эспрессо с водой', 180, 0),
+            ('Напитки', 'Капучино', 'Эспрессо с молочной пенкой', 220, 0),
+            ('Напитки', 'Свежевыжатый сок', 'Апельсин/Яблоко/Морковь', 250, 0),
+            ('Напитки', 'Лимонад домашний', 'С лимоном и мятой', 200, 1),
+        ]
+        
+        # CROSS JOIN keeps the VALUES rows as the outer loop, so ids follow list order
+        cursor.execute(f"""
+            WITH v(category, name, description, price, is_new) AS (
+                VALUES {", ".join(["(?, ?, ?, ?, ?)"] * len(sample_items))}
+            )
+            INSERT INTO menu_items (category_id, name, description, price, is_new)
+            SELECT c.id, v.name, v.description, v.price, v.is_new
+            FROM v CROSS JOIN categories c ON c.name = v.category
+            WHERE NOT EXISTS (SELECT 1 FROM menu_items)
+        """, [value for item in sample_items for value in item])
         
         # Insert sample stories if empty
-        cursor.execute("SELECT COUNT(*) FROM stories")
-        if cursor.fetchone()[0] == 0:
-            sample_stories = [
-                ('Новинки недели! 🆕', 'Попробуйте наши новые блюда', None, None, 'new'),
-                ('Скидка 20% на завтраки', 'До 12:00 каждый день', None, None, 'promo'),
-                ('Наш Telegram канал', 'Подписывайтесь на новости', None, 'https://t.me/your_channel', 'channel'),
-            ]
-            
-            for title, desc, img, link, stype in sample_stories:
-                cursor.execute("""
-                    INSERT INTO stories (title, description, image_url, link, story_type)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (title, desc, img, link, stype))
+        sample_stories = [
+            ('Новинки недели! 🆕', 'Попробуйте наши новые блюда', None, None, 'new'),
+            ('Скидка 20% на завтраки', 'До 12:00 каждый день', None, None, 'promo'),
+            ('Наш Telegram канал', 'Подписывайтесь на новости', None, 'https://t.me/your_channel', 'channel'),
+        ]
+        
+        cursor.execute(f"""
+            WITH v(title, description, image_url, link, story_type) AS (
+                VALUES {", ".join(["(?, ?, ?, ?, ?)"] * len(sample_stories))}
+            )
+            INSERT INTO stories (title, description, image_url, link, story_type)
+            SELECT * FROM v
+            WHERE NOT EXISTS (SELECT 1 FROM stories)
+        """, [value for story in sample_stories for value in story])
+        
+        cursor.execute("COMMIT")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        
+        # Refresh planner statistics so the indexes above get picked
+        cursor.execute("ANALYZE")
+
+
+# ============ HOT-PATH QUERIES ============
+# Kept as module constants so sqlite3's per-connection statement cache
+# (keyed by SQL text) reuses the prepared statement on every call
+
+SQL_GET_USER = "SELECT * FROM users WHERE telegram_id = ?"
+
+SQL_GET_USERS_BY_ROLE = "SELECT * FROM users WHERE role = ?"
+
+SQL_GET_STAFF_USERS = """
+    SELECT telegram_id, username, first_name, role FROM users
+    WHERE role IN ('admin', 'courier') OR telegram_id = ?
+"""
+
+SQL_GET_CATEGORIES = """
+    SELECT * FROM categories 
+    WHERE is_active = 1 
+    ORDER BY sort_order
+"""
+
+SQL_GET_MENU_ITEM = """
+    SELECT m.*, c.name as category_name
+    FROM menu_items m
+    JOIN categories c ON m.category_id = c.id
+    WHERE m.id = ?
+"""
+
+# Every dish, available or not, grouped by category for the director's list
+SQL_GET_MENU_WITH_CATEGORIES = """
+    SELECT m.*, c.emoji as category_emoji, c.name as category_name
+    FROM menu_items m
+    JOIN categories c ON m.category_id = c.id
+    WHERE c.is_active = 1
+    ORDER BY c.sort_order, c.id, m.sort_order
+"""
+
+SQL_GET_STORIES = """
+    SELECT * FROM stories 
+    WHERE is_active = 1 
+    ORDER BY sort_order
+"""
+
+# Rebuilds an order's items in the shape callers expect: id, name, price, quantity
+SQL_ORDER_ITEMS = """
+    (SELECT json_group_array(json_object(
+                'id', oi.menu_item_id, 'name', oi.name,
+                'price', oi.unit_price, 'quantity', oi.qty))
+     FROM (SELECT menu_item_id, name, unit_price, qty FROM order_items
+           WHERE order_id = o.id ORDER BY line_no) oi) AS items
+"""
+
+SQL_INSERT_ORDER_ITEM = """
+    INSERT INTO order_items (order_id, menu_item_id, name, qty, unit_price, line_no)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(order_id, menu_item_id) DO UPDATE SET qty = qty + excluded.qty
+"""
+
+SQL_GET_ORDER = f"""
+    SELECT o.*, u.first_name, u.phone, u.username,
+           c.first_name AS courier_first_name, {SQL_ORDER_ITEMS}
+    FROM orders o
+    JOIN users u ON o.user_id = u.telegram_id
+    LEFT JOIN users c ON o.courier_id = c.telegram_id
+    WHERE o.id = ?
+"""
+
+
+# ============ READ CACHES ============
+# Users and menu data are cached with a TTL, so changes made by another process
+# (the bot and webapp/api.py may run separately) are picked up within it; writes
+# through this module clear the cache at once. Cached rows are copied on the
+# way out so callers cannot mutate the cache.
+
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL = 60
+
+_user_cache: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+# Bumped by every invalidation, so a row read before one is not cached after it
+_user_generation = 0
+
+
+def invalidate_user(telegram_id: int):
+    """Drop a user from the read cache"""
+    global _user_generation
+    with _user_cache_lock:
+        _user_cache.pop(telegram_id, None)
+        _user_generation += 1
+
+
+MENU_CACHE_TTL = 30
+
+_menu_version = 0
+_menu_expires_at = 0.0
+
+
+def _expire_menu():
+    """Drop the menu caches once they are older than MENU_CACHE_TTL"""
+    if time.monotonic() >= _menu_expires_at:
+        invalidate_menu()
+
+
+def menu_version() -> int:
+    """Counter bumped on every menu change or expiry, for caches kept outside this module"""
+    _expire_menu()
+    return _menu_version
+
+
+def invalidate_menu():
+    """Drop cached categories, menu items and stories"""
+    global _menu_version, _menu_expires_at
+    _load_categories.cache_clear()
+    _load_menu_items.cache_clear()
+    _load_stories.cache_clear()
+    _menu_version += 1
+    _menu_expires_at = time.monotonic() + MENU_CACHE_TTL
 
 
 # ============ USER FUNCTIONS ============
 
+def get_cached_user(telegram_id: int) -> Optional[Dict[str, Any]]:
+    """Get user from the read cache only; None if not cached or expired"""
+    with _user_cache_lock:
+        cached = _user_cache.get(telegram_id)
+        if cached and cached[0] > time.monotonic():
+            _user_cache.move_to_end(telegram_id)
+            return dict(cached[1])
+    return None
+
+
 def get_user(telegram_id: int) -> Optional[Dict[str, Any]]:
     """Get user by telegram_id"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+    user = get_cached_user(telegram_id)
+    if user is not None:
+        return user
+    
+    now = time.monotonic()
+    generation = _user_generation
+    with get_connection(readonly=True) as conn:
+        row = conn.execute(SQL_GET_USER, (telegram_id,)).fetchone()
+    if not row:
+        return None
+    
+    user = dict(row)
+    with _user_cache_lock:
+        # A write invalidated users while we read; this row may predate it
+        if generation != _user_generation:
+            return dict(user)
+        _user_cache[telegram_id] = (now + USER_CACHE_TTL, user)
+        _user_cache.move_to_end(telegram_id)
+        if len(_user_cache) > USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+    return dict(user)
 
 
 def create_user(telegram_id: int, username: str = None, first_name: str = None, 
@@ -207,8 +507,34 @@ def create_user(telegram_id: int, username: str = None, first_name: str = None,
                 first_name = excluded.first_name,
                 last_name = excluded.last_name,
                 updated_at = CURRENT_TIMESTAMP
+            RETURNING *
         """, (telegram_id, username, first_name, last_name, welcome_bonus))
-    return get_user(telegram_id)
+        row = cursor.fetchone()
+    invalidate_user(telegram_id)
+    return dict(row) if row else None
+
+
+def get_or_create_user(telegram_id: int, username: str = None, first_name: str = None,
+                       last_name: str = None,
+                       welcome_bonus: int = 500) -> Tuple[Dict[str, Any], bool]:
+    """Get user, registering them with welcome bonus if new.
+    Returns (user, is_new); an existing user's row is left as is"""
+    user = get_user(telegram_id)
+    if user:
+        return user, False
+    
+    with get_connection() as conn:
+        # DO NOTHING: if a concurrent /start registered them first, keep that row
+        row = conn.execute("""
+            INSERT INTO users (telegram_id, username, first_name, last_name, balance_bonus)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(telegram_id) DO NOTHING
+            RETURNING *
+        """, (telegram_id, username, first_name, last_name, welcome_bonus)).fetchone()
+    if row is None:
+        return get_user(telegram_id), False
+    invalidate_user(telegram_id)
+    return dict(row), True
 
 
 def update_user_address(telegram_id: int, address: str):
@@ -219,6 +545,7 @@ def update_user_address(telegram_id: int, address: str):
             UPDATE users SET address = ?, updated_at = CURRENT_TIMESTAMP
             WHERE telegram_id = ?
         """, (address, telegram_id))
+    invalidate_user(telegram_id)
 
 
 def update_user_phone(telegram_id: int, phone: str):
@@ -229,11 +556,12 @@ def update_user_phone(telegram_id: int, phone: str):
             UPDATE users SET phone = ?, updated_at = CURRENT_TIMESTAMP
             WHERE telegram_id = ?
         """, (phone, telegram_id))
+    invalidate_user(telegram_id)
 
 
 def update_user_role(telegram_id: int, role: str) -> bool:
     """Update user role (admin, courier, user)"""
-    if role not in ('director', 'admin', 'courier', 'user'):
+    if role not in _VALID_ROLES:
         return False
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -244,29 +572,53 @@ def update_user_role(telegram_id: int, role: str) -> bool:
             UPDATE users SET role = ?, updated_at = CURRENT_TIMESTAMP
             WHERE telegram_id = ?
         """, (role, telegram_id))
-        return cursor.rowcount > 0
+        updated = cursor.rowcount > 0
+    invalidate_user(telegram_id)
+    return updated
+
+
+def promote_user(telegram_id: int, role: str) -> Optional[Dict[str, Any]]:
+    """Give a user a staff role, creating them (without welcome bonus) if new.
+    Returns their first_name and username, or None for the director or a bad role"""
+    if role not in _VALID_ROLES or telegram_id == DIRECTOR_ID:
+        return None
+    with get_connection() as conn:
+        row = conn.execute("""
+            INSERT INTO users (telegram_id, role, balance_bonus) VALUES (?, ?, 0)
+            ON CONFLICT(telegram_id) DO UPDATE SET
+                role = excluded.role,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING first_name, username
+        """, (telegram_id, role)).fetchone()
+    invalidate_user(telegram_id)
+    return dict(row) if row else None
 
 
 def get_users_by_role(role: str) -> List[Dict[str, Any]]:
     """Get all users with specific role"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE role = ?", (role,))
-        return [dict(row) for row in cursor.fetchall()]
+    with get_connection(readonly=True) as conn:
+        return [dict(row) for row in conn.execute(SQL_GET_USERS_BY_ROLE, (role,))]
+
+
+def get_staff_users(director_id: int) -> List[Dict[str, Any]]:
+    """Get the director, admins and couriers in one query"""
+    with get_connection(readonly=True) as conn:
+        return [dict(row) for row in conn.execute(SQL_GET_STAFF_USERS, (director_id,))]
 
 
 def use_user_bonus(telegram_id: int, amount: int) -> bool:
-    """Use bonus from user balance"""
-    user = get_user(telegram_id)
-    if not user or user['balance_bonus'] < amount:
-        return False
+    """Use bonus from user balance. Returns False if the balance is too low"""
     with get_connection() as conn:
         cursor = conn.cursor()
+        # Balance check and deduction in one statement, so concurrent orders cannot overdraw
         cursor.execute("""
             UPDATE users SET balance_bonus = balance_bonus - ?, updated_at = CURRENT_TIMESTAMP
-            WHERE telegram_id = ?
-        """, (amount, telegram_id))
-    return True
+            WHERE telegram_id = ? AND balance_bonus >= ?
+        """, (amount, telegram_id, amount))
+        used = cursor.rowcount == 1
+    # Also on failure: the caller's balance came from a stale read
+    invalidate_user(telegram_id)
+    return used
 
 
 def add_user_cashback(telegram_id: int, amount: int):
@@ -277,25 +629,26 @@ def add_user_cashback(telegram_id: int, amount: int):
             UPDATE users SET balance_cashback = balance_cashback + ?, updated_at = CURRENT_TIMESTAMP
             WHERE telegram_id = ?
         """, (amount, telegram_id))
+    invalidate_user(telegram_id)
 
 
 # ============ MENU FUNCTIONS ============
 
+@lru_cache(maxsize=32)
+def _load_categories() -> Tuple[Dict[str, Any], ...]:
+    with get_connection(readonly=True) as conn:
+        return tuple(dict(row) for row in conn.execute(SQL_GET_CATEGORIES))
+
+
 def get_categories() -> List[Dict[str, Any]]:
     """Get all active categories"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM categories 
-            WHERE is_active = 1 
-            ORDER BY sort_order
-        """)
-        return [dict(row) for row in cursor.fetchall()]
+    _expire_menu()
+    return [dict(row) for row in _load_categories()]
 
 
-def get_menu_items(category_id: int = None) -> List[Dict[str, Any]]:
-    """Get menu items, optionally filtered by category"""
-    with get_connection() as conn:
+@lru_cache(maxsize=32)
+def _load_menu_items(category_id: int = None) -> Tuple[Dict[str, Any], ...]:
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
         if category_id:
             cursor.execute("""
@@ -313,20 +666,25 @@ def get_menu_items(category_id: int = None) -> List[Dict[str, Any]]:
                 WHERE m.is_available = 1
                 ORDER BY c.sort_order, m.sort_order
             """)
-        return [dict(row) for row in cursor.fetchall()]
+        return tuple(dict(row) for row in cursor.fetchall())
+
+
+def get_menu_items(category_id: int = None) -> List[Dict[str, Any]]:
+    """Get menu items, optionally filtered by category"""
+    _expire_menu()
+    return [dict(row) for row in _load_menu_items(category_id or None)]
+
+
+def get_menu_with_categories() -> List[Dict[str, Any]]:
+    """Get all menu items with their category, ordered by category"""
+    with get_connection(readonly=True) as conn:
+        return [dict(row) for row in conn.execute(SQL_GET_MENU_WITH_CATEGORIES)]
 
 
 def get_menu_item(item_id: int) -> Optional[Dict[str, Any]]:
     """Get single menu item by id"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT m.*, c.name as category_name
-            FROM menu_items m
-            JOIN categories c ON m.category_id = c.id
-            WHERE m.id = ?
-        """, (item_id,))
-        row = cursor.fetchone()
+    with get_connection(readonly=True) as conn:
+        row = conn.execute(SQL_GET_MENU_ITEM, (item_id,)).fetchone()
         return dict(row) if row else None
 
 
@@ -339,23 +697,49 @@ def add_menu_item(category_id: int, name: str, description: str, price: int,
             INSERT INTO menu_items (category_id, name, description, price, image_url, is_new)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (category_id, name, description, price, image_url, is_new))
-        return cursor.lastrowid
+        item_id = cursor.lastrowid
+    invalidate_menu()
+    return item_id
+
+
+_MENU_ITEM_FIELDS = frozenset({'name', 'description', 'price', 'image_url', 'is_available', 'is_new', 'category_id'})
+
+
+@lru_cache(maxsize=None)
+def _menu_item_update_sql(fields: Tuple[str, ...]) -> str:
+    """UPDATE text for a sorted field tuple, so equal field sets share one cached statement"""
+    set_clause = ", ".join([f"{k} = ?" for k in fields])
+    return f"UPDATE menu_items SET {set_clause} WHERE id = ?"
 
 
 def update_menu_item(item_id: int, **kwargs) -> bool:
     """Update menu item fields"""
-    allowed_fields = ['name', 'description', 'price', 'image_url', 'is_available', 'is_new', 'category_id']
-    updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
-    if not updates:
+    fields = tuple(sorted(k for k in kwargs if k in _MENU_ITEM_FIELDS))
+    if not fields:
         return False
     
-    set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-    values = list(updates.values()) + [item_id]
+    values = [kwargs[k] for k in fields] + [item_id]
     
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(f"UPDATE menu_items SET {set_clause} WHERE id = ?", values)
-        return cursor.rowcount > 0
+        updated = conn.execute(_menu_item_update_sql(fields), values).rowcount > 0
+    invalidate_menu()
+    return updated
+
+
+def toggle_menu_item_availability(item_id: int) -> Optional[Dict[str, Any]]:
+    """Flip a menu item between available and hidden.
+    Returns the updated item, or None if there is no such item"""
+    with get_connection() as conn:
+        row = conn.execute("""
+            UPDATE menu_items
+            SET is_available = CASE WHEN COALESCE(is_available, 1) THEN 0 ELSE 1 END
+            WHERE id = ?
+            RETURNING id, name, price, description, is_available
+        """, (item_id,)).fetchone()
+    if row is None:
+        return None
+    invalidate_menu()
+    return dict(row)
 
 
 def delete_menu_item(item_id: int) -> bool:
@@ -363,21 +747,23 @@ def delete_menu_item(item_id: int) -> bool:
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM menu_items WHERE id = ?", (item_id,))
-        return cursor.rowcount > 0
+        deleted = cursor.rowcount > 0
+    invalidate_menu()
+    return deleted
 
 
 # ============ STORIES FUNCTIONS ============
 
+@lru_cache(maxsize=32)
+def _load_stories() -> Tuple[Dict[str, Any], ...]:
+    with get_connection(readonly=True) as conn:
+        return tuple(dict(row) for row in conn.execute(SQL_GET_STORIES))
+
+
 def get_stories() -> List[Dict[str, Any]]:
     """Get all active stories"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM stories 
-            WHERE is_active = 1 
-            ORDER BY sort_order
-        """)
-        return [dict(row) for row in cursor.fetchall()]
+    _expire_menu()
+    return [dict(row) for row in _load_stories()]
 
 
 # ============ ORDER FUNCTIONS ============
@@ -388,103 +774,151 @@ def create_order(user_id: int, items: List[Dict], total_price: int,
     """Create new order"""
     with get_connection() as conn:
         cursor = conn.cursor()
+        # Integer division keeps the cashback in whole rubles, rounded down
         cursor.execute("""
-            INSERT INTO orders (user_id, items, total_price, delivery_address, 
-                              bonus_used, cashback_used, payment_method)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, json.dumps(items, ensure_ascii=False), total_price, 
-              delivery_address, bonus_used, cashback_used, payment_method))
-        return cursor.lastrowid
+            INSERT INTO orders (user_id, total_price, delivery_address, 
+                              bonus_used, cashback_used, payment_method, cashback_amount)
+            VALUES (?, ?, ?, ?, ?, ?, ? * ? / 100)
+        """, (user_id, total_price, delivery_address, bonus_used, cashback_used, payment_method,
+              total_price, CASHBACK_PERCENT))
+        order_id = cursor.lastrowid
+        cursor.executemany(SQL_INSERT_ORDER_ITEM, [
+            (order_id, item['id'], item['name'], item['quantity'], item['price'], line_no)
+            for line_no, item in enumerate(items)
+        ])
+        return order_id
+
+
+def _rows_to_orders(rows) -> List[Dict[str, Any]]:
+    """Convert order rows to dicts with items decoded"""
+    return [{**dict(row), 'items': orjson.loads(row['items'])} for row in rows]
 
 
 def get_order(order_id: int) -> Optional[Dict[str, Any]]:
     """Get order by id"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT o.*, u.first_name, u.phone, u.username
-            FROM orders o
-            JOIN users u ON o.user_id = u.telegram_id
-            WHERE o.id = ?
-        """, (order_id,))
-        row = cursor.fetchone()
-        if row:
-            result = dict(row)
-            result['items'] = json.loads(result['items'])
-            return result
-        return None
+    with get_connection(readonly=True) as conn:
+        row = conn.execute(SQL_GET_ORDER, (order_id,)).fetchone()
+        return _rows_to_orders([row])[0] if row else None
 
 
 def get_user_orders(user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
     """Get user orders"""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM orders 
+        cursor.execute(f"""
+            SELECT o.*, {SQL_ORDER_ITEMS}
+            FROM orders o
             WHERE user_id = ? 
             ORDER BY created_at DESC 
             LIMIT ?
         """, (user_id, limit))
-        orders = []
-        for row in cursor.fetchall():
-            order = dict(row)
-            order['items'] = json.loads(order['items'])
-            orders.append(order)
-        return orders
+        return _rows_to_orders(cursor.fetchall())
 
 
-def get_pending_orders() -> List[Dict[str, Any]]:
-    """Get all pending orders for admin"""
-    with get_connection() as conn:
+def get_user_order_summaries(user_id: int, limit: int = 5,
+                             offset: int = 0) -> List[Dict[str, Any]]:
+    """Get id, status and total of user's most recent orders, for order lists"""
+    with get_connection(readonly=True) as conn:
+        return [dict(row) for row in conn.execute("""
+            SELECT id, status, total_price FROM orders
+            WHERE user_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ? OFFSET ?
+        """, (user_id, limit, offset))]
+
+
+def get_pending_orders(limit: int = None, after_id: int = None) -> List[Dict[str, Any]]:
+    """Get pending orders for admin, oldest first.
+    Pass the last id of the previous page as after_id to get the next page"""
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT o.*, u.first_name, u.phone, u.username
+        cursor.execute(f"""
+            SELECT o.*, u.first_name, u.phone, u.username, {SQL_ORDER_ITEMS}
             FROM orders o
             JOIN users u ON o.user_id = u.telegram_id
             WHERE o.status IN ('pending', 'confirmed', 'cooking', 'ready')
-            ORDER BY o.created_at ASC
-        """)
-        orders = []
-        for row in cursor.fetchall():
-            order = dict(row)
-            order['items'] = json.loads(order['items'])
-            orders.append(order)
-        return orders
+              AND (:after_id IS NULL OR o.id > :after_id)
+            ORDER BY o.id ASC
+            LIMIT :limit
+        """, {"after_id": after_id, "limit": -1 if limit is None else limit})
+        return _rows_to_orders(cursor.fetchall())
 
 
-def get_courier_orders(courier_id: int) -> List[Dict[str, Any]]:
-    """Get orders assigned to courier"""
-    with get_connection() as conn:
+def get_courier_orders(courier_id: int, limit: int = None,
+                       after_id: int = None) -> List[Dict[str, Any]]:
+    """Get orders assigned to courier, oldest first; paged like get_pending_orders"""
+    with get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT o.*, u.first_name, u.phone, u.username, {SQL_ORDER_ITEMS}
+            FROM orders o
+            JOIN users u ON o.user_id = u.telegram_id
+            WHERE o.courier_id = :courier_id AND o.status IN ('ready', 'delivering')
+              AND (:after_id IS NULL OR o.id > :after_id)
+            ORDER BY o.id ASC
+            LIMIT :limit
+        """, {"courier_id": courier_id, "after_id": after_id,
+              "limit": -1 if limit is None else limit})
+        return _rows_to_orders(cursor.fetchall())
+
+
+def get_courier_delivered_orders(courier_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+    """Get courier's most recently delivered orders"""
+    with get_connection(readonly=True) as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT o.*, u.first_name, u.phone, u.username
+            SELECT o.*, u.first_name
             FROM orders o
             JOIN users u ON o.user_id = u.telegram_id
-            WHERE o.courier_id = ? AND o.status IN ('ready', 'delivering')
-            ORDER BY o.created_at ASC
-        """, (courier_id,))
-        orders = []
-        for row in cursor.fetchall():
-            order = dict(row)
-            order['items'] = json.loads(order['items'])
-            orders.append(order)
-        return orders
+            WHERE o.courier_id = ? AND o.status = 'delivered'
+            ORDER BY o.updated_at DESC
+            LIMIT ?
+        """, (courier_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def update_order_status(order_id: int, status: str) -> bool:
-    """Update order status"""
-    valid_statuses = ['pending', 'confirmed', 'cooking', 'ready', 'delivering', 'delivered', 'cancelled']
-    if status not in valid_statuses:
+    """Update order status. Returns False if the order is missing or already has it"""
+    if status not in _VALID_ORDER_STATUSES:
         return False
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (status, order_id))
+            WHERE id = ? AND status <> ?
+        """, (status, order_id, status))
         return cursor.rowcount > 0
 
 
+def cancel_order_if_pending(order_id: int) -> bool:
+    """Cancel order unless it is already past pending. Returns True if cancelled"""
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            UPDATE orders SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+        """, (order_id,))
+        return cursor.rowcount == 1
+
+
+def mark_order_delivered(order_id: int) -> Optional[int]:
+    """Mark order as delivered and credit its cashback to the customer in one transaction.
+    Returns the credited amount, or None if the order is missing or already delivered"""
+    with get_connection() as conn:
+        row = conn.execute("""
+            UPDATE orders SET status = 'delivered', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status <> 'delivered'
+            RETURNING user_id, cashback_amount
+        """, (order_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("""
+            UPDATE users SET balance_cashback = balance_cashback + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE telegram_id = ?
+        """, (row['cashback_amount'], row['user_id']))
+    invalidate_user(row['user_id'])
+    return row['cashback_amount']
+
+
 def assign_courier(order_id: int, courier_id: int) -> bool:
     """Assign courier to order"""
     with get_connection() as conn:
@@ -498,8 +932,7 @@ def assign_courier(order_id: int, courier_id: int) -> bool:
 
 def update_payment_status(order_id: int, status: str) -> bool:
     """Update payment status"""
-    valid_statuses = ['pending', 'paid', 'failed', 'refunded']
-    if status not in valid_statuses:
+    if status not in _VALID_PAYMENT_STATUSES:
         return False
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -510,46 +943,100 @@ def update_payment_status(order_id: int, status: str) -> bool:
         return cursor.rowcount > 0
 
 
+# ============ STATISTICS ============
+
+def get_order_stats() -> Dict[str, int]:
+    """Get staff dashboard counters in one query"""
+    with get_connection(readonly=True) as conn:
+        row = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM users) AS total_users,
+                (SELECT COUNT(*) FROM users WHERE role = 'user') AS total_customers,
+                (SELECT COUNT(*) FROM menu_items WHERE is_available = 1) AS active_dishes,
+                (SELECT COUNT(*) FROM orders) AS total_orders,
+                (SELECT COUNT(*) FROM orders WHERE date(created_at) = date('now')) AS today_orders,
+                (SELECT COUNT(*) FROM orders WHERE status NOT IN ('delivered', 'cancelled')) AS active_orders,
+                (SELECT COALESCE(SUM(total_price), 0) FROM orders WHERE status = 'delivered') AS total_revenue
+        """).fetchone()
+        return dict(row)
+
+
 # ============ FULL MENU EXPORT/IMPORT ============
 
-def export_menu_json() -> str:
-    """Export full menu as JSON for admin editing"""
-    categories = get_categories()
-    menu_items = get_menu_items()
-    
-    menu_data = {
-        "categories": categories,
-        "items": menu_items
-    }
-    return json.dumps(menu_data, ensure_ascii=False, indent=2)
+def export_menu_json() -> bytes:
+    """Export full menu as UTF-8 JSON for admin editing"""
+    # The document is assembled by SQLite's JSON1 functions in one query;
+    # the BLOB cast hands it over as bytes, ready to send as a file
+    with get_connection(readonly=True) as conn:
+        return conn.execute("""
+            SELECT CAST(json_object(
+                'categories', (
+                    SELECT json_group_array(json_object(
+                        'id', id, 'name', name, 'emoji', emoji,
+                        'sort_order', sort_order, 'is_active', is_active))
+                    FROM (SELECT * FROM categories WHERE is_active = 1 ORDER BY sort_order)
+                ),
+                'items', (
+                    SELECT json_group_array(json_object(
+                        'id', id, 'category_id', category_id, 'name', name,
+                        'description', description, 'price', price, 'image_url', image_url,
+                        'is_available', is_available, 'is_new', is_new, 'sort_order', sort_order))
+                    FROM (
+                        SELECT m.* FROM menu_items m
+                        JOIN categories c ON m.category_id = c.id
+                        WHERE m.is_available = 1
+                        ORDER BY c.sort_order, m.sort_order
+                    )
+                )
+            ) AS BLOB)
+        """).fetchone()[0]
 
 
-def import_menu_json(json_str: str) -> bool:
-    """Import menu from JSON"""
+def import_menu_json(data: Union[str, bytes, BinaryIO]) -> bool:
+    """Import menu from JSON text, UTF-8 bytes or a binary file object
+    such as the BytesIO returned by bot.download_file"""
     try:
-        data = json.loads(json_str)
+        if isinstance(data, io.BytesIO):
+            # getvalue() shares the buffer instead of copying it like read()
+            data = data.getvalue()
+        elif hasattr(data, 'read'):
+            data = data.read()
+        # SQLite's JSON functions take TEXT only, so decode exactly once here
+        json_str = str(data, 'utf-8') if isinstance(data, (bytes, bytearray)) else data
+        
         with get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # The JSON document is parsed once by SQLite and each array is
+            # inserted by a single statement via json_each
             
             # Update categories
-            if "categories" in data:
-                for cat in data["categories"]:
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO categories (id, name, emoji, sort_order, is_active)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (cat.get('id'), cat['name'], cat.get('emoji', '🍽'), 
-                          cat.get('sort_order', 0), cat.get('is_active', 1)))
+            cursor.execute("""
+                INSERT OR REPLACE INTO categories (id, name, emoji, sort_order, is_active)
+                SELECT json_extract(value, '$.id'), json_extract(value, '$.name'),
+                       COALESCE(json_extract(value, '$.emoji'), '🍽'),
+                       COALESCE(json_extract(value, '$.sort_order'), 0),
+                       COALESCE(json_extract(value, '$.is_active'), 1)
+                FROM json_each(?, '$.categories')
+            """, (json_str,))
             
             # Update items
-            if "items" in data:
-                for item in data["items"]:
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO menu_items 
-                        (id, category_id, name, description, price, image_url, is_available, is_new, sort_order)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (item.get('id'), item['category_id'], item['name'], 
-                          item.get('description', ''), item['price'], item.get('image_url'),
-                          item.get('is_available', 1), item.get('is_new', 0), item.get('sort_order', 0)))
+            cursor.execute("""
+                INSERT OR REPLACE INTO menu_items 
+                (id, category_id, name, description, price, image_url, is_available, is_new, sort_order)
+                SELECT json_extract(value, '$.id'), json_extract(value, '$.category_id'),
+                       json_extract(value, '$.name'),
+                       COALESCE(json_extract(value, '$.description'), ''),
+                       json_extract(value, '$.price'), json_extract(value, '$.image_url'),
+                       COALESCE(json_extract(value, '$.is_available'), 1),
+                       COALESCE(json_extract(value, '$.is_new'), 0),
+                       COALESCE(json_extract(value, '$.sort_order'), 0)
+                FROM json_each(?, '$.items')
+            """, (json_str,))
+            
+            cursor.execute("COMMIT")
+        invalidate_menu()
         return True
     except Exception as e:
         print(f"Menu import error: {e}")
@@ -0,0 +1,88 @@
+"""
+Async access to Telegram Cafe Bot database
+Runs the blocking sqlite3 functions from database.py in worker threads
+so a slow query doesn't stall the bot's event loop
+"""
+
+import asyncio
+import functools
+from typing import Any, Dict, Optional, Tuple
+
+import database
+from database import DIRECTOR_ID
+
+
+def _in_thread(func):
+    """Wrap a blocking database function as a coroutine"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+# ============ USER FUNCTIONS ============
+
+async def get_user(telegram_id: int) -> Optional[Dict[str, Any]]:
+    """Get user by telegram_id; cached users are returned without a thread hop"""
+    user = database.get_cached_user(telegram_id)
+    if user is not None:
+        return user
+    return await asyncio.to_thread(database.get_user, telegram_id)
+
+
+async def get_or_create_user(telegram_id: int, *args, **kwargs) -> Tuple[Dict[str, Any], bool]:
+    """Get user, registering them if new; cached users skip the thread hop"""
+    user = database.get_cached_user(telegram_id)
+    if user is not None:
+        return user, False
+    return await asyncio.to_thread(database.get_or_create_user, telegram_id, *args, **kwargs)
+
+
+create_user = _in_thread(database.create_user)
+update_user_address = _in_thread(database.update_user_address)
+update_user_phone = _in_thread(database.update_user_phone)
+update_user_role = _in_thread(database.update_user_role)
+promote_user = _in_thread(database.promote_user)
+get_users_by_role = _in_thread(database.get_users_by_role)
+get_staff_users = _in_thread(database.get_staff_users)
+use_user_bonus = _in_thread(database.use_user_bonus)
+add_user_cashback = _in_thread(database.add_user_cashback)
+
+# ============ MENU FUNCTIONS ============
+
+get_categories = _in_thread(database.get_categories)
+get_menu_items = _in_thread(database.get_menu_items)
+get_menu_with_categories = _in_thread(database.get_menu_with_categories)
+get_menu_item = _in_thread(database.get_menu_item)
+add_menu_item = _in_thread(database.add_menu_item)
+update_menu_item = _in_thread(database.update_menu_item)
+toggle_menu_item_availability = _in_thread(database.toggle_menu_item_availability)
+delete_menu_item = _in_thread(database.delete_menu_item)
+
+# ============ STORIES FUNCTIONS ============
+
+get_stories = _in_thread(database.get_stories)
+
+# ============ ORDER FUNCTIONS ============
+
+create_order = _in_thread(database.create_order)
+get_order = _in_thread(database.get_order)
+get_user_orders = _in_thread(database.get_user_orders)
+get_user_order_summaries = _in_thread(database.get_user_order_summaries)
+get_pending_orders = _in_thread(database.get_pending_orders)
+get_courier_orders = _in_thread(database.get_courier_orders)
+get_courier_delivered_orders = _in_thread(database.get_courier_delivered_orders)
+update_order_status = _in_thread(database.update_order_status)
+cancel_order_if_pending = _in_thread(database.cancel_order_if_pending)
+mark_order_delivered = _in_thread(database.mark_order_delivered)
+assign_courier = _in_thread(database.assign_courier)
+update_payment_status = _in_thread(database.update_payment_status)
+
+# ============ STATISTICS ============
+
+get_order_stats = _in_thread(database.get_order_stats)
+
+# ============ EXPORT/IMPORT FUNCTIONS ============
+
+export_menu_json = _in_thread(database.export_menu_json)
+import_menu_json = _in_thread(database.import_menu_json)
@@ -0,0 +1,88 @@
+"""
+Connection pool for Telegram Cafe Bot database
+Keeps SQLite connections open between queries instead of reconnecting on every call
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from typing import List
+from urllib.parse import quote
+
+# Per-connection prepared statement cache size (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Shared-cache URI used when the database path is ":memory:", so every
+# pooled connection sees the same in-memory database (tests, CI)
+MEMORY_URI = "file:cafe_bot?mode=memory&cache=shared"
+
+# Applied once to every pooled connection right after it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA cache_size=-20000",
+)
+
+
+class ConnectionPool:
+    """Pool of long-lived connections: one read-write and several read-only"""
+
+    def __init__(self, database: str, readers: int = 3):
+        self.database = database
+        self.in_memory = database == ":memory:"
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._writer: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=1)
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=readers)
+
+        if self.in_memory:
+            writer_target, writer_uri = MEMORY_URI, True
+            reader_uri = MEMORY_URI
+        else:
+            writer_target, writer_uri = database, False
+            reader_uri = f"file:{quote(os.path.abspath(database))}?mode=ro"
+
+        # Writer goes first so the file exists before read-only connections open it
+        self._writer.put(self._open(writer_target, uri=writer_uri))
+
+        for _ in range(readers):
+            reader = self._open(reader_uri, uri=True)
+            if self.in_memory:
+                # Shared-cache readers would otherwise hit table locks held by the writer
+                reader.execute("PRAGMA query_only=ON")
+                reader.execute("PRAGMA read_uncommitted=ON")
+            self._readers.put(reader)
+
+        atexit.register(self.close)
+
+    def _open(self, target: str, uri: bool) -> sqlite3.Connection:
+        """Open and configure a single pooled connection"""
+        conn = sqlite3.connect(
+            target, uri=uri, check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def acquire(self, readonly: bool = False) -> sqlite3.Connection:
+        """Take a connection from the pool, blocking until one is free"""
+        return (self._readers if readonly else self._writer).get()
+
+    def release(self, conn: sqlite3.Connection, readonly: bool = False):
+        """Return a connection to the pool, keeping it open"""
+        (self._readers if readonly else self._writer).put(conn)
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -4,31 +4,37 @@ Handles admin panel, order management, menu editing
 """
 
 from aiogram import Router, F, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.filters import Command
+from aiogram.utils.callback_answer import CallbackAnswer, CallbackAnswerMiddleware
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import os
 import json
 
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from database import (
-    get_user, get_users_by_role, get_pending_orders, get_order,
-    update_order_status, assign_courier, get_categories, get_menu_items,
-    add_menu_item, delete_menu_item, export_menu_json, import_menu_json
+from db_async import (
+    get_pending_orders, get_order,
+    update_order_status, assign_courier,
+    add_menu_item, delete_menu_item, export_menu_json, import_menu_json,
+    get_order_stats
 )
 from keyboards import (
     get_admin_panel_keyboard, get_order_manage_keyboard,
     get_menu_edit_keyboard, get_category_select_keyboard,
     get_menu_items_keyboard
 )
+from callbacks import OrderViewCB, OrderStatusCB, AssignCourierCB
+from auth import require_role
+from constants import STATUS_NAMES, ADMIN_ROLES
+from utils import format_order_card, edit_if_changed
+from notifier import notify
+from cache import list_couriers, get_categories_cached, get_menu_items_cached
 
 router = Router()
-
-DIRECTOR_ID = int(os.getenv("DIRECTOR_ID", "7592151419"))
+# One prefix check skips every handler below for other routers' buttons
+router.callback_query.filter(F.data.startswith("admin:"))
+# Callback queries are answered once the handler returns; handlers set
+# callback_answer.text / show_alert instead of calling callback.answer()
+router.callback_query.middleware(CallbackAnswerMiddleware())
 
 
 class AdminStates(StatesGroup):
@@ -40,33 +46,28 @@ class AdminStates(StatesGroup):
     adding_item_category = State()
 
 
-def is_admin_or_director(user_id: int) -> bool:
-    """Check if user is admin or director"""
-    if user_id == DIRECTOR_ID:
-        return True
-    user = get_user(user_id)
-    return user and user['role'] in ('admin', 'director')
+ORDERS_PAGE_SIZE = 10
 
 
-# Status translations
-STATUS_NAMES = {
-    'pending': '⏳ Ожидает',
-    'confirmed': '✅ Подтверждён',
-    'cooking': '👨‍🍳 Готовится',
-    'ready': '📦 Готов',
-    'delivering': '🚚 Доставляется',
-    'delivered': '✅ Доставлен',
-    'cancelled': '❌ Отменён'
-}
+async def show_order_card(message: Message, order: dict):
+    """Show admin order card with management keyboard, skipping unchanged edits"""
+    couriers = await list_couriers()
+    
+    courier_name = None
+    if order['courier_id']:
+        courier_name = order['courier_first_name'] or order['courier_id']
+    
+    text, digest = format_order_card(order, STATUS_NAMES, courier_name=courier_name)
+    await edit_if_changed(
+        message, text, digest,
+        get_order_manage_keyboard(order['id'], order['status'], couriers)
+    )
 
 
 @router.message(Command("admin"))
-async def cmd_admin(message: Message):
+@require_role(ADMIN_ROLES, message_text="⛔ У вас нет доступа к админ-панели")
+async def cmd_admin(message: Message, role: str):
     """Handle /admin command"""
-    if not is_admin_or_director(message.from_user.id):
-        await message.answer("⛔ У вас нет доступа к админ-панели")
-        return
-    
     await message.answer(
         "🛠 <b>Админ-панель</b>\n\n"
         "Выберите действие:",
@@ -76,13 +77,20 @@ async def cmd_admin(message: Message):
 
 
 @router.callback_query(F.data == "admin:orders")
-async def admin_orders_callback(callback: CallbackQuery):
-    """Show pending orders"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    orders = get_pending_orders()
+@router.callback_query(F.data.startswith("admin:orders:page:"))
+@require_role(ADMIN_ROLES)
+async def admin_orders_callback(callback: CallbackQuery, role: str,
+                                callback_answer: CallbackAnswer):
+    """Show pending orders, one page at a time"""
+    # Page cursor is the id of the last order on the previous page
+    after_id = None
+    if callback.data.startswith("admin:orders:page:"):
+        after_id = int(callback.data.split(":")[3])
+    
+    # One extra row tells whether there is a next page
+    orders = await get_pending_orders(limit=ORDERS_PAGE_SIZE + 1, after_id=after_id)
+    has_more = len(orders) > ORDERS_PAGE_SIZE
+    orders = orders[:ORDERS_PAGE_SIZE]
     
     if not orders:
         await callback.message.edit_text(
@@ -91,29 +99,29 @@ async def admin_orders_callback(callback: CallbackQuery):
             parse_mode="HTML",
             reply_markup=get_admin_panel_keyboard()
         )
-        await callback.answer()
         return
     
-    orders_text = "📋 <b>Активные заказы:</b>\n\n"
-    
-    for order in orders[:10]:
-        items_count = len(order['items'])
-        orders_text += (
-            f"#{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
-            f"👤 {order.get('first_name', 'Неизвестно')} | {items_count} поз. | {order['total_price']}₽\n"
-            f"📍 {order['delivery_address'][:40]}...\n\n"
-        )
+    orders_text = "📋 <b>Активные заказы:</b>\n\n" + "".join(
+        f"#{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
+        f"👤 {order.get('first_name', 'Неизвестно')} | {len(order['items'])} поз. | {order['total_price']}₽\n"
+        f"📍 {order['delivery_address'][:40]}...\n\n"
+        for order in orders
+    )
     
     # Create keyboard with order buttons
     from aiogram.utils.keyboard import InlineKeyboardBuilder
     builder = InlineKeyboardBuilder()
     
-    for order in orders[:5]:
+    for order in orders:
         builder.button(
             text=f"#{order['id']} - {order['total_price']}₽",
-            callback_data=f"admin:view_order:{order['id']}"
+            callback_data=OrderViewCB(order_id=order['id'])
         )
     
+    if has_more:
+        builder.button(text="➡️ Ещё", callback_data=f"admin:orders:page:{orders[-1]['id']}")
+    if after_id is not None:
+        builder.button(text="⬅️ В начало", callback_data="admin:orders")
     builder.button(text="🔙 Назад", callback_data="admin:back")
     builder.adjust(1)
     
@@ -122,73 +130,42 @@ async def admin_orders_callback(callback: CallbackQuery):
         parse_mode="HTML",
         reply_markup=builder.as_markup()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:view_order:"))
-async def admin_view_order_callback(callback: CallbackQuery):
+@router.callback_query(OrderViewCB.filter())
+@require_role(ADMIN_ROLES)
+async def admin_view_order_callback(callback: CallbackQuery, callback_data: OrderViewCB,
+                                    role: str, callback_answer: CallbackAnswer):
     """View single order details for admin"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order = await get_order(callback_data.order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    # Get available couriers
-    couriers = get_users_by_role('courier')
-    
-    # Format items
-    items_text = "\n".join([
-        f"  • {item['name']} × {item['quantity']} = {item['price'] * item['quantity']}₽"
-        for item in order['items']
-    ])
-    
-    order_text = (
-        f"📦 <b>Заказ #{order['id']}</b>\n\n"
-        f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
-        f"📱 Телефон: {order.get('phone', 'Не указан')}\n"
-        f"📍 Адрес: {order['delivery_address']}\n\n"
-        f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n"
-        f"💳 Оплата: {'✅ Оплачен' if order['payment_status'] == 'paid' else '⏳ Ожидает'}\n\n"
-        f"🍽 <b>Состав:</b>\n{items_text}\n\n"
-        f"💰 <b>Итого: {order['total_price']}₽</b>"
-    )
-    
-    if order['courier_id']:
-        courier = get_user(order['courier_id'])
-        if courier:
-            order_text += f"\n🚚 Курьер: {courier.get('first_name', courier['telegram_id'])}"
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_order_manage_keyboard(order_id, order['status'], couriers)
-    )
-    await callback.answer()
+    await show_order_card(callback.message, order)
 
 
-@router.callback_query(F.data.startswith("admin:order_status:"))
-async def admin_change_status_callback(callback: CallbackQuery, bot: Bot):
+@router.callback_query(OrderStatusCB.filter())
+@require_role(ADMIN_ROLES)
+async def admin_change_status_callback(callback: CallbackQuery,
+                                       callback_data: OrderStatusCB, role: str,
+                                       callback_answer: CallbackAnswer):
     """Change order status"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    parts = callback.data.split(":")
-    order_id = int(parts[2])
-    new_status = parts[3]
+    order_id = callback_data.order_id
+    new_status = callback_data.status
     
-    order = get_order(order_id)
+    order = await get_order(order_id)
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    update_order_status(order_id, new_status)
+    # Double taps on the same button: nothing to write, notify or redraw
+    if order['status'] == new_status or not await update_order_status(order_id, new_status):
+        callback_answer.text = "Статус уже установлен"
+        return
     
     # Формируем детальное уведомление для клиента
     notification_messages = {
@@ -220,143 +197,96 @@ async def admin_change_status_callback(callback: CallbackQuery, bot: Bot):
     )
     
     # Notify user about status change
-    try:
-        await bot.send_message(
-            order['user_id'],
-            notification_text,
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        print(f"Failed to notify user: {e}")
+    await notify(order['user_id'], notification_text, parse_mode="HTML")
     
-    await callback.answer(f"Статус изменён на: {STATUS_NAMES.get(new_status, new_status)}")
+    callback_answer.text = f"Статус изменён на: {STATUS_NAMES.get(new_status, new_status)}"
     
     # Refresh order view
-    order = get_order(order_id)
-    couriers = get_users_by_role('courier')
-    
-    items_text = "\n".join([
-        f"  • {item['name']} × {item['quantity']} = {item['price'] * item['quantity']}₽"
-        for item in order['items']
-    ])
-    
-    order_text = (
-        f"📦 <b>Заказ #{order['id']}</b>\n\n"
-        f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
-        f"📍 Адрес: {order['delivery_address']}\n\n"
-        f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n\n"
-        f"🍽 <b>Состав:</b>\n{items_text}\n\n"
-        f"💰 <b>Итого: {order['total_price']}₽</b>"
-    )
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_order_manage_keyboard(order_id, order['status'], couriers)
-    )
+    order = await get_order(order_id)
+    await show_order_card(callback.message, order)
 
 
-@router.callback_query(F.data.startswith("admin:assign_courier:"))
-async def admin_assign_courier_callback(callback: CallbackQuery, bot: Bot):
+@router.callback_query(AssignCourierCB.filter())
+@require_role(ADMIN_ROLES)
+async def admin_assign_courier_callback(callback: CallbackQuery,
+                                        callback_data: AssignCourierCB, role: str,
+                                        callback_answer: CallbackAnswer):
     """Assign courier to order"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
+    order_id = callback_data.order_id
+    courier_id = callback_data.courier_id
     
-    parts = callback.data.split(":")
-    order_id = int(parts[2])
-    courier_id = int(parts[3])
+    await assign_courier(order_id, courier_id)
     
-    assign_courier(order_id, courier_id)
+    order = await get_order(order_id)
+    courier_name = order['courier_first_name'] or 'Курьер'
     
-    order = get_order(order_id)
-    courier = get_user(courier_id)
-    courier_name = courier.get('first_name', 'Курьер') if courier else 'Курьер'
+    items_text = "\n".join(
+        f"  • {item['name']} × {item['quantity']}"
+        for item in order['items']
+    )
     
     # Notify customer about courier assignment
-    try:
-        await bot.send_message(
-            order['user_id'],
-            f"🚚 <b>Курьер назначен на ваш заказ #{order_id}!</b>\n\n"
-            f"👤 Курьер: {courier_name}\n"
-            f"📍 Адрес доставки: {order['delivery_address']}\n\n"
-            f"Курьер скоро заберёт ваш заказ и отправится к вам!",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        print(f"Failed to notify customer about courier: {e}")
+    await notify(
+        order['user_id'],
+        f"🚚 <b>Курьер назначен на ваш заказ #{order_id}!</b>\n\n"
+        f"👤 Курьер: {courier_name}\n"
+        f"📍 Адрес доставки: {order['delivery_address']}\n\n"
+        f"Курьер скоро заберёт ваш заказ и отправится к вам!",
+        parse_mode="HTML"
+    )
     
     # Notify courier
-    try:
-        items_text = "\n".join([
-            f"  • {item['name']} × {item['quantity']}"
-            for item in order['items']
-        ])
-        
-        await bot.send_message(
-            courier_id,
-            f"🚚 <b>Новый заказ для доставки!</b>\n\n"
-            f"📦 Заказ #{order_id}\n"
-            f"📍 Адрес: {order['delivery_address']}\n"
-            f"📱 Телефон: {order.get('phone', 'Не указан')}\n\n"
-            f"🍽 Состав:\n{items_text}\n\n"
-            f"💰 Сумма: {order['total_price']}₽\n\n"
-            f"Используйте /courier для управления доставками.",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        print(f"Failed to notify courier: {e}")
+    await notify(
+        courier_id,
+        f"🚚 <b>Новый заказ для доставки!</b>\n\n"
+        f"📦 Заказ #{order_id}\n"
+        f"📍 Адрес: {order['delivery_address']}\n"
+        f"📱 Телефон: {order.get('phone', 'Не указан')}\n\n"
+        f"🍽 Состав:\n{items_text}\n\n"
+        f"💰 Сумма: {order['total_price']}₽\n\n"
+        f"Используйте /courier для управления доставками.",
+        parse_mode="HTML"
+    )
     
-    await callback.answer("Курьер назначен ✅")
+    callback_answer.text = "Курьер назначен ✅"
     
     # Go back to orders list
-    await admin_orders_callback(callback)
+    await admin_orders_callback(callback, role=role, callback_answer=callback_answer)
 
 
 @router.callback_query(F.data == "admin:menu")
-async def admin_menu_callback(callback: CallbackQuery):
+@require_role(ADMIN_ROLES)
+async def admin_menu_callback(callback: CallbackQuery, role: str, callback_answer: CallbackAnswer):
     """Show menu editing options"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
     await callback.message.edit_text(
         "🍽 <b>Редактирование меню</b>\n\n"
         "Выберите действие:",
         parse_mode="HTML",
         reply_markup=get_menu_edit_keyboard()
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data == "admin:export_menu")
-async def admin_export_menu_callback(callback: CallbackQuery):
+@require_role(ADMIN_ROLES)
+async def admin_export_menu_callback(callback: CallbackQuery, role: str,
+                                     callback_answer: CallbackAnswer):
     """Export menu as JSON"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    menu_json = export_menu_json()
-    
     # Send as file
-    from aiogram.types import BufferedInputFile
-    file = BufferedInputFile(menu_json.encode('utf-8'), filename="menu.json")
+    file = BufferedInputFile(await export_menu_json(), filename="menu.json")
     
     await callback.message.answer_document(
         file,
         caption="📥 Меню экспортировано.\n\n"
                 "Отредактируйте JSON и отправьте обратно для импорта."
     )
-    await callback.answer("Меню экспортировано")
+    callback_answer.text = "Меню экспортировано"
 
 
 @router.callback_query(F.data == "admin:import_menu")
-async def admin_import_menu_callback(callback: CallbackQuery, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_import_menu_callback(callback: CallbackQuery, state: FSMContext, role: str,
+                                     callback_answer: CallbackAnswer):
     """Start menu import process"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
     await state.set_state(AdminStates.waiting_menu_json)
     
     await callback.message.edit_text(
@@ -365,21 +295,18 @@ async def admin_import_menu_callback(callback: CallbackQuery, state: FSMContext)
         "Отправьте /cancel для отмены.",
         parse_mode="HTML"
     )
-    await callback.answer()
 
 
 @router.message(AdminStates.waiting_menu_json, F.document)
-async def admin_import_menu_file(message: Message, state: FSMContext, bot: Bot):
+@require_role(ADMIN_ROLES)
+async def admin_import_menu_file(message: Message, state: FSMContext, bot: Bot, role: str):
     """Handle menu JSON file upload"""
-    if not is_admin_or_director(message.from_user.id):
-        return
-    
     file = await bot.get_file(message.document.file_id)
     file_content = await bot.download_file(file.file_path)
     
     try:
-        json_str = file_content.read().decode('utf-8')
-        if import_menu_json(json_str):
+        # Decoding and parsing happen in the importer's worker thread
+        if await import_menu_json(file_content):
             await message.answer("✅ Меню успешно импортировано!")
         else:
             await message.answer("❌ Ошибка импорта. Проверьте формат JSON.")
@@ -390,17 +317,15 @@ async def admin_import_menu_file(message: Message, state: FSMContext, bot: Bot):
 
 
 @router.message(AdminStates.waiting_menu_json, F.text)
-async def admin_import_menu_text(message: Message, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_import_menu_text(message: Message, state: FSMContext, role: str):
     """Handle menu JSON text"""
-    if not is_admin_or_director(message.from_user.id):
-        return
-    
     if message.text == "/cancel":
         await state.clear()
         await message.answer("❌ Импорт отменён", reply_markup=get_admin_panel_keyboard())
         return
     
-    if import_menu_json(message.text):
+    if await import_menu_json(message.text):
         await message.answer("✅ Меню успешно импортировано!")
     else:
         await message.answer("❌ Ошибка импорта. Проверьте формат JSON.")
@@ -409,13 +334,11 @@ async def admin_import_menu_text(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "admin:add_item")
-async def admin_add_item_callback(callback: CallbackQuery, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_add_item_callback(callback: CallbackQuery, state: FSMContext, role: str,
+                                  callback_answer: CallbackAnswer):
     """Start adding new menu item"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    categories = get_categories()
+    categories = await get_categories_cached()
     
     await callback.message.edit_text(
         "➕ <b>Добавление блюда</b>\n\n"
@@ -423,16 +346,13 @@ async def admin_add_item_callback(callback: CallbackQuery, state: FSMContext):
         parse_mode="HTML",
         reply_markup=get_category_select_keyboard(categories, "add")
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("admin:add_category:"))
-async def admin_add_category_callback(callback: CallbackQuery, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_add_category_callback(callback: CallbackQuery, state: FSMContext, role: str,
+                                      callback_answer: CallbackAnswer):
     """Set category for new item"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
     category_id = int(callback.data.split(":")[2])
     await state.update_data(category_id=category_id)
     await state.set_state(AdminStates.waiting_item_name)
@@ -442,15 +362,12 @@ async def admin_add_category_callback(callback: CallbackQuery, state: FSMContext
         "Введите название блюда:",
         parse_mode="HTML"
     )
-    await callback.answer()
 
 
 @router.message(AdminStates.waiting_item_name)
-async def admin_item_name_handler(message: Message, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_item_name_handler(message: Message, state: FSMContext, role: str):
     """Handle item name input"""
-    if not is_admin_or_director(message.from_user.id):
-        return
-    
     await state.update_data(item_name=message.text)
     await state.set_state(AdminStates.waiting_item_description)
     
@@ -458,11 +375,9 @@ async def admin_item_name_handler(message: Message, state: FSMContext):
 
 
 @router.message(AdminStates.waiting_item_description)
-async def admin_item_description_handler(message: Message, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_item_description_handler(message: Message, state: FSMContext, role: str):
     """Handle item description input"""
-    if not is_admin_or_director(message.from_user.id):
-        return
-    
     await state.update_data(item_description=message.text)
     await state.set_state(AdminStates.waiting_item_price)
     
@@ -470,11 +385,9 @@ async def admin_item_description_handler(message: Message, state: FSMContext):
 
 
 @router.message(AdminStates.waiting_item_price)
-async def admin_item_price_handler(message: Message, state: FSMContext):
+@require_role(ADMIN_ROLES)
+async def admin_item_price_handler(message: Message, state: FSMContext, role: str):
     """Handle item price input and create item"""
-    if not is_admin_or_director(message.from_user.id):
-        return
-    
     try:
         price = int(message.text)
     except ValueError:
@@ -483,7 +396,7 @@ async def admin_item_price_handler(message: Message, state: FSMContext):
     
     data = await state.get_data()
     
-    item_id = add_menu_item(
+    item_id = await add_menu_item(
         category_id=data['category_id'],
         name=data['item_name'],
         description=data['item_description'],
@@ -502,13 +415,11 @@ async def admin_item_price_handler(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "admin:delete_item")
-async def admin_delete_item_callback(callback: CallbackQuery):
+@require_role(ADMIN_ROLES)
+async def admin_delete_item_callback(callback: CallbackQuery, role: str,
+                                     callback_answer: CallbackAnswer):
     """Show items for deletion"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    items = get_menu_items()
+    items = await get_menu_items_cached()
     
     await callback.message.edit_text(
         "❌ <b>Удаление блюда</b>\n\n"
@@ -516,76 +427,45 @@ async def admin_delete_item_callback(callback: CallbackQuery):
         parse_mode="HTML",
         reply_markup=get_menu_items_keyboard(items, "delete")
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("admin:delete_item:"))
-async def admin_delete_item_confirm_callback(callback: CallbackQuery):
+@require_role(ADMIN_ROLES)
+async def admin_delete_item_confirm_callback(callback: CallbackQuery, role: str,
+                                             callback_answer: CallbackAnswer):
     """Delete menu item"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
     item_id = int(callback.data.split(":")[2])
     
-    if delete_menu_item(item_id):
-        await callback.answer("✅ Блюдо удалено")
-    else:
-        await callback.answer("❌ Ошибка удаления", show_alert=True)
+    if not await delete_menu_item(item_id):
+        callback_answer.text = "❌ Ошибка удаления"
+        callback_answer.show_alert = True
+        return
     
-    # Refresh list
-    items = get_menu_items()
-    await callback.message.edit_text(
-        "❌ <b>Удаление блюда</b>\n\n"
-        "Выберите блюдо для удаления:",
-        parse_mode="HTML",
+    callback_answer.text = "✅ Блюдо удалено"
+    
+    # Refresh list; the button came from the deletion list, so only its keyboard changes
+    items = await get_menu_items_cached()
+    await callback.message.edit_reply_markup(
         reply_markup=get_menu_items_keyboard(items, "delete")
     )
 
 
 @router.callback_query(F.data == "admin:stats")
-async def admin_stats_callback(callback: CallbackQuery):
+@require_role(ADMIN_ROLES)
+async def admin_stats_callback(callback: CallbackQuery, role: str, callback_answer: CallbackAnswer):
     """Show statistics"""
-    if not is_admin_or_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    from database import get_connection
-    
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Total orders
-        cursor.execute("SELECT COUNT(*) FROM orders")
-        total_orders = cursor.fetchone()[0]
-        
-        # Today orders
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE date(created_at) = date('now')")
-        today_orders = cursor.fetchone()[0]
-        
-        # Total revenue
-        cursor.execute("SELECT COALESCE(SUM(total_price), 0) FROM orders WHERE status = 'delivered'")
-        total_revenue = cursor.fetchone()[0]
-        
-        # Total users
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        # Active orders
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status NOT IN ('delivered', 'cancelled')")
-        active_orders = cursor.fetchone()[0]
+    stats = await get_order_stats()
     
     await callback.message.edit_text(
         "📊 <b>Статистика</b>\n\n"
-        f"👥 Всего пользователей: {total_users}\n"
-        f"📦 Всего заказов: {total_orders}\n"
-        f"📦 Заказов сегодня: {today_orders}\n"
-        f"⏳ Активных заказов: {active_orders}\n"
-        f"💰 Общая выручка: {total_revenue}₽",
+        f"👥 Всего пользователей: {stats['total_users']}\n"
+        f"📦 Всего заказов: {stats['total_orders']}\n"
+        f"📦 Заказов сегодня: {stats['today_orders']}\n"
+        f"⏳ Активных заказов: {stats['active_orders']}\n"
+        f"💰 Общая выручка: {stats['total_revenue']}₽",
         parse_mode="HTML",
         reply_markup=get_admin_panel_keyboard()
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data.in_({"admin:back", "admin:close"}))
@@ -595,7 +475,6 @@ async def admin_back_callback(callback: CallbackQuery, state: FSMContext):
     
     if callback.data == "admin:close":
         await callback.message.delete()
-        await callback.answer()
         return
     
     await callback.message.edit_text(
@@ -604,4 +483,3 @@ async def admin_back_callback(callback: CallbackQuery, state: FSMContext):
         parse_mode="HTML",
         reply_markup=get_admin_panel_keyboard()
     )
-    await callback.answer()
@@ -3,53 +3,40 @@ Courier handlers for Telegram Cafe Bot
 Handles courier delivery management
 """
 
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
+from aiogram.utils.callback_answer import CallbackAnswer, CallbackAnswerMiddleware
 import os
 
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from database import (
-    get_user, get_courier_orders, get_order, update_order_status, DIRECTOR_ID
+from db_async import (
+    get_courier_orders, get_order, update_order_status, mark_order_delivered
 )
 from keyboards import (
     get_courier_panel_keyboard, get_courier_order_keyboard
 )
+from callbacks import CourierCB
+from auth import require_role
+from constants import STATUS_NAMES, COURIER_ROLES
+from utils import format_order_card, edit_if_changed
+from notifier import notify
 
 router = Router()
+# One prefix check skips every handler below for other routers' buttons
+router.callback_query.filter(F.data.startswith("courier:"))
+# Callback queries are answered once the handler returns; handlers set
+# callback_answer.text / show_alert instead of calling callback.answer()
+router.callback_query.middleware(CallbackAnswerMiddleware())
 
 
-# Status translations
-STATUS_NAMES = {
-    'pending': '⏳ Ожидает',
-    'confirmed': '✅ Подтверждён',
-    'cooking': '👨‍🍳 Готовится',
-    'ready': '📦 Готов к доставке',
-    'delivering': '🚚 Доставляется',
-    'delivered': '✅ Доставлен',
-    'cancelled': '❌ Отменён'
-}
-
-
-def is_courier_or_higher(user_id: int) -> bool:
-    """Check if user is courier, admin or director"""
-    if user_id == DIRECTOR_ID:
-        return True
-    user = get_user(user_id)
-    return user and user['role'] in ('courier', 'admin', 'director')
+ORDERS_PAGE_SIZE = 10
 
 
 @router.message(Command("courier"))
-async def cmd_courier(message: Message):
+@require_role(COURIER_ROLES, message_text="⛔ Эта команда доступна только курьерам")
+async def cmd_courier(message: Message, role: str):
     """Handle /courier command"""
-    if not is_courier_or_higher(message.from_user.id):
-        await message.answer("⛔ Эта команда доступна только курьерам")
-        return
-    
-    orders = get_courier_orders(message.from_user.id)
+    orders = await get_courier_orders(message.from_user.id)
     
     if not orders:
         await message.answer(
@@ -60,15 +47,13 @@ async def cmd_courier(message: Message):
         )
         return
     
-    orders_text = "🚚 <b>Ваши доставки:</b>\n\n"
-    
-    for order in orders:
-        orders_text += (
-            f"📦 <b>Заказ #{order['id']}</b>\n"
-            f"📍 {order['delivery_address']}\n"
-            f"📊 {STATUS_NAMES.get(order['status'], order['status'])}\n"
-            f"💰 {order['total_price']}₽\n\n"
-        )
+    orders_text = "🚚 <b>Ваши доставки:</b>\n\n" + "".join(
+        f"📦 <b>Заказ #{order['id']}</b>\n"
+        f"📍 {order['delivery_address']}\n"
+        f"📊 {STATUS_NAMES.get(order['status'], order['status'])}\n"
+        f"💰 {order['total_price']}₽\n\n"
+        for order in orders
+    )
     
     await message.answer(
         orders_text,
@@ -78,13 +63,22 @@ async def cmd_courier(message: Message):
 
 
 @router.callback_query(F.data == "courier:orders")
-async def courier_orders_callback(callback: CallbackQuery):
-    """Show courier orders"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    orders = get_courier_orders(callback.from_user.id)
+@router.callback_query(F.data.startswith("courier:orders:page:"))
+@require_role(COURIER_ROLES)
+async def courier_orders_callback(callback: CallbackQuery, role: str,
+                                  callback_answer: CallbackAnswer):
+    """Show courier orders, one page at a time"""
+    # Page cursor is the id of the last order on the previous page
+    after_id = None
+    if callback.data.startswith("courier:orders:page:"):
+        after_id = int(callback.data.split(":")[3])
+    
+    # One extra row tells whether there is a next page
+    orders = await get_courier_orders(
+        callback.from_user.id, limit=ORDERS_PAGE_SIZE + 1, after_id=after_id
+    )
+    has_more = len(orders) > ORDERS_PAGE_SIZE
+    orders = orders[:ORDERS_PAGE_SIZE]
     
     if not orders:
         await callback.message.edit_text(
@@ -93,7 +87,6 @@ async def courier_orders_callback(callback: CallbackQuery):
             parse_mode="HTML",
             reply_markup=get_courier_panel_keyboard()
         )
-        await callback.answer()
         return
     
     # Create inline keyboard with orders
@@ -104,205 +97,157 @@ async def courier_orders_callback(callback: CallbackQuery):
         status_emoji = '📦' if order['status'] == 'ready' else '🚚'
         builder.button(
             text=f"{status_emoji} #{order['id']} - {order['total_price']}₽",
-            callback_data=f"courier:view:{order['id']}"
+            callback_data=CourierCB(action="view", order_id=order['id'])
         )
     
+    if has_more:
+        builder.button(text="➡️ Ещё", callback_data=f"courier:orders:page:{orders[-1]['id']}")
+    if after_id is not None:
+        builder.button(text="⬅️ В начало", callback_data="courier:orders")
     builder.button(text="🔙 Закрыть", callback_data="courier:close")
     builder.adjust(1)
     
-    orders_text = "🚚 <b>Ваши доставки:</b>\n\n"
-    
-    for order in orders:
-        orders_text += (
-            f"📦 Заказ #{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
-            f"📍 {order['delivery_address'][:40]}...\n\n"
-        )
+    orders_text = "🚚 <b>Ваши доставки:</b>\n\n" + "".join(
+        f"📦 Заказ #{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
+        f"📍 {order['delivery_address'][:40]}...\n\n"
+        for order in orders
+    )
     
     await callback.message.edit_text(
         orders_text,
         parse_mode="HTML",
         reply_markup=builder.as_markup()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("courier:view:"))
-async def courier_view_order_callback(callback: CallbackQuery):
+@router.callback_query(CourierCB.filter(F.action == "view"))
+@require_role(COURIER_ROLES)
+async def courier_view_order_callback(callback: CallbackQuery, callback_data: CourierCB,
+                                      role: str, callback_answer: CallbackAnswer):
     """View order details for courier"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order_id = callback_data.order_id
+    order = await get_order(order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    # Format items
-    items_text = "\n".join([
-        f"  • {item['name']} × {item['quantity']}"
-        for item in order['items']
-    ])
-    
-    order_text = (
-        f"📦 <b>Заказ #{order['id']}</b>\n\n"
-        f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
-        f"📱 Телефон: {order.get('phone', 'Не указан')}\n"
-        f"📍 Адрес: {order['delivery_address']}\n\n"
-        f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n\n"
-        f"🍽 <b>Состав:</b>\n{items_text}\n\n"
-        f"💰 <b>Сумма: {order['total_price']}₽</b>\n"
-        f"💳 Оплата: {'✅ Оплачен' if order['payment_status'] == 'paid' else '💵 При получении'}"
+    text, digest = format_order_card(order, STATUS_NAMES, for_courier=True)
+    await edit_if_changed(
+        callback.message, text, digest,
+        get_courier_order_keyboard(order_id, order['status'])
     )
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_courier_order_keyboard(order_id, order['status'])
-    )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("courier:pickup:"))
-async def courier_pickup_callback(callback: CallbackQuery, bot: Bot):
+@router.callback_query(CourierCB.filter(F.action == "pickup"))
+@require_role(COURIER_ROLES)
+async def courier_pickup_callback(callback: CallbackQuery, callback_data: CourierCB,
+                                  role: str, callback_answer: CallbackAnswer):
     """Mark order as picked up (delivering)"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order_id = callback_data.order_id
+    order = await get_order(order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    update_order_status(order_id, 'delivering')
+    if not await update_order_status(order_id, 'delivering'):
+        callback_answer.text = "Заказ уже забран"
+        return
     
     # Notify customer
-    try:
-        await bot.send_message(
-            order['user_id'],
-            f"🚚 <b>Заказ #{order_id} в пути!</b>\n\n"
-            f"Курьер забрал ваш заказ и направляется к вам.\n"
-            f"📍 Адрес доставки: {order['delivery_address']}",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        print(f"Failed to notify customer: {e}")
+    await notify(
+        order['user_id'],
+        f"🚚 <b>Заказ #{order_id} в пути!</b>\n\n"
+        f"Курьер забрал ваш заказ и направляется к вам.\n"
+        f"📍 Адрес доставки: {order['delivery_address']}",
+        parse_mode="HTML"
+    )
     
-    await callback.answer("✅ Заказ отмечен как забран")
+    callback_answer.text = "✅ Заказ отмечен как забран"
     
     # Refresh order view
-    order = get_order(order_id)
-    
-    items_text = "\n".join([
-        f"  • {item['name']} × {item['quantity']}"
-        for item in order['items']
-    ])
-    
-    order_text = (
-        f"📦 <b>Заказ #{order['id']}</b>\n\n"
-        f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
-        f"📱 Телефон: {order.get('phone', 'Не указан')}\n"
-        f"📍 Адрес: {order['delivery_address']}\n\n"
-        f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n\n"
-        f"🍽 <b>Состав:</b>\n{items_text}\n\n"
-        f"💰 <b>Сумма: {order['total_price']}₽</b>"
-    )
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_courier_order_keyboard(order_id, order['status'])
+    order = await get_order(order_id)
+    text, digest = format_order_card(order, STATUS_NAMES, for_courier=True)
+    await edit_if_changed(
+        callback.message, text, digest,
+        get_courier_order_keyboard(order_id, order['status'])
     )
 
 
-@router.callback_query(F.data.startswith("courier:delivered:"))
-async def courier_delivered_callback(callback: CallbackQuery, bot: Bot):
+@router.callback_query(CourierCB.filter(F.action == "delivered"))
+@require_role(COURIER_ROLES)
+async def courier_delivered_callback(callback: CallbackQuery, callback_data: CourierCB,
+                                     role: str, callback_answer: CallbackAnswer):
     """Mark order as delivered"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order_id = callback_data.order_id
+    order = await get_order(order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    update_order_status(order_id, 'delivered')
-    
-    # Add cashback to user (5% of order)
-    from database import add_user_cashback
-    cashback = int(order['total_price'] * 0.05)
-    add_user_cashback(order['user_id'], cashback)
-    
-    # Notify customer
-    try:
-        await bot.send_message(
-            order['user_id'],
-            f"✅ <b>Заказ #{order_id} доставлен!</b>\n\n"
-            f"Спасибо за заказ! 🙏\n\n"
-            f"💰 Вам начислено {cashback}₽ кешбэка!\n\n"
-            f"Будем рады видеть вас снова! 🍽",
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        print(f"Failed to notify customer: {e}")
+    # Status change and cashback (fixed when the order was placed) are one write
+    cashback = await mark_order_delivered(order_id)
+    if cashback is None:
+        callback_answer.text = "Заказ уже доставлен"
+        return
     
-    await callback.answer("✅ Заказ доставлен! Отличная работа!")
+    callback_answer.text = "✅ Заказ доставлен! Отличная работа!"
     
     # Go back to orders list
-    await courier_orders_callback(callback)
+    await courier_orders_callback(callback, role=role, callback_answer=callback_answer)
+    
+    # Notify customer
+    await notify(
+        order['user_id'],
+        f"✅ <b>Заказ #{order_id} доставлен!</b>\n\n"
+        f"Спасибо за заказ! 🙏\n\n"
+        f"💰 Вам начислено {cashback}₽ кешбэка!\n\n"
+        f"Будем рады видеть вас снова! 🍽",
+        parse_mode="HTML"
+    )
 
 
-@router.callback_query(F.data.startswith("courier:address:"))
-async def courier_address_callback(callback: CallbackQuery):
+@router.callback_query(CourierCB.filter(F.action == "address"))
+@require_role(COURIER_ROLES)
+async def courier_address_callback(callback: CallbackQuery, callback_data: CourierCB,
+                                   role: str, callback_answer: CallbackAnswer):
     """Show full address"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order_id = callback_data.order_id
+    order = await get_order(order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
-    await callback.answer(
-        f"📍 {order['delivery_address']}",
-        show_alert=True
-    )
+    callback_answer.text = f"📍 {order['delivery_address']}"
+    callback_answer.show_alert = True
 
 
-@router.callback_query(F.data.startswith("courier:call:"))
-async def courier_call_callback(callback: CallbackQuery):
+@router.callback_query(CourierCB.filter(F.action == "call"))
+@require_role(COURIER_ROLES)
+async def courier_call_callback(callback: CallbackQuery, callback_data: CourierCB,
+                                role: str, callback_answer: CallbackAnswer):
     """Show customer phone"""
-    if not is_courier_or_higher(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    order_id = int(callback.data.split(":")[2])
-    order = get_order(order_id)
+    order_id = callback_data.order_id
+    order = await get_order(order_id)
     
     if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
+        callback_answer.text = "Заказ не найден"
+        callback_answer.show_alert = True
         return
     
     phone = order.get('phone', 'Не указан')
-    await callback.answer(
-        f"📞 {phone}",
-        show_alert=True
-    )
+    callback_answer.text = f"📞 {phone}"
+    callback_answer.show_alert = True
 
 
 @router.callback_query(F.data == "courier:close")
 async def courier_close_callback(callback: CallbackQuery):
     """Close courier panel"""
     await callback.message.delete()
-    await callback.answer()
@@ -8,25 +8,53 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+import asyncio
+import hashlib
 import os
-
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from database import (
-    get_user, create_user, update_user_role, get_users_by_role, DIRECTOR_ID,
-    get_categories, get_menu_items, get_menu_item, add_menu_item,
-    update_menu_item, delete_menu_item, get_connection
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from db_async import (
+    get_user, promote_user, update_user_role, DIRECTOR_ID,
+    get_categories, get_menu_items, get_menu_with_categories, get_menu_item,
+    add_menu_item, update_menu_item, delete_menu_item, toggle_menu_item_availability,
+    get_order_stats, get_pending_orders
 )
+from middlewares import invalidate_role
+from cache import list_staff, invalidate_staff
+from utils import edit_if_changed, gather_calls
+from auth import IsDirector
+from constants import STATUS_NAMES
 from keyboards import (
     get_director_panel_keyboard, get_role_list_keyboard,
     get_confirm_role_action_keyboard, get_director_staff_keyboard,
     get_director_menu_management_keyboard, get_dish_list_keyboard,
-    get_dish_edit_keyboard, get_category_select_keyboard
+    get_dish_edit_keyboard, get_confirm_delete_dish_keyboard, get_category_select_keyboard
 )
 
 router = Router()
+# Checked once per update instead of in every handler: other routers' buttons
+# and anyone but the director skip this router (user.py answers them)
+router.callback_query.filter(
+    F.data.startswith(("director:", "admin:director_add_category:")), IsDirector()
+)
+router.message.filter(IsDirector())
+
+# Static screens; only the director gets past the router filter, so the panel's ID is fixed
+_PANEL_TEXT = (
+    "👑 <b>Панель директора</b>\n\n"
+    f"🆔 Ваш ID: <code>{DIRECTOR_ID}</code>\n\n"
+    "Управление ролями персонала:"
+)
+_PANEL_DIGEST = hashlib.sha1(_PANEL_TEXT.encode()).hexdigest()
+_ADD_STAFF_HINT = (
+    "Введите Telegram ID пользователя:\n\n"
+    "<i>Пользователь может узнать свой ID, написав боту /start</i>\n\n"
+    "Отправьте /cancel для отмены."
+)
+_ADD_ADMIN_PROMPT = "➕ <b>Добавление администратора</b>\n\n" + _ADD_STAFF_HINT
+_ADD_COURIER_PROMPT = "➕ <b>Добавление курьера</b>\n\n" + _ADD_STAFF_HINT
+_ROLE_NAMES = {'admin': '🛠 Администратор', 'courier': '🚚 Курьер'}
 
 
 class DirectorStates(StatesGroup):
@@ -46,52 +74,77 @@ class DirectorStates(StatesGroup):
     waiting_edit_image = State()
 
 
-def is_director(user_id: int) -> bool:
-    """Check if user is director"""
-    return user_id == DIRECTOR_ID
+# States of the hot add-admin / add-courier flow, bound once
+_WAIT_ADMIN = DirectorStates.waiting_admin_id
+_WAIT_COURIER = DirectorStates.waiting_courier_id
+
+
+# Telegram user ids fit in 52 bits, i.e. at most 16 decimal digits
+_MAX_ID_DIGITS = 16
+
+
+def _parse_user_id(text: Optional[str]) -> Optional[int]:
+    """Parse a typed Telegram ID without exception-driven control flow"""
+    text = (text or "").strip()
+    # isascii() rules out Unicode digits such as '²' that int() rejects
+    if text.isascii() and text.isdigit() and len(text) <= _MAX_ID_DIGITS:
+        return int(text)
+    return None
+
+
+# Director buttons ("director:<action>" or "director:<action>:<id>"), dispatched by
+# one dict lookup on the action instead of a filter per handler; handlers that
+# take an id parse it from callback.data themselves
+_ACTIONS: Dict[str, Callable[[CallbackQuery, FSMContext], Awaitable[Any]]] = {}
+
+
+def _action(name: str):
+    """Register a handler for the director:<name> buttons"""
+    def register(handler):
+        _ACTIONS[name] = handler
+        return handler
+    return register
+
+
+@router.callback_query(F.data.startswith("director:"))
+async def director_action_callback(callback: CallbackQuery, state: FSMContext):
+    """Route a director button to its handler"""
+    action = callback.data.split(":", 2)[1]
+    handler = _ACTIONS.get(action)
+    if handler is None:
+        # Button from an older version of the panel
+        await callback.answer()
+        return
+    await handler(callback, state)
 
 
 @router.message(Command("director"))
 async def cmd_director(message: Message):
     """Handle /director command"""
-    if not is_director(message.from_user.id):
-        await message.answer("⛔ Эта команда доступна только директору")
-        return
-    
     await message.answer(
-        "👑 <b>Панель директора</b>\n\n"
-        f"🆔 Ваш ID: <code>{message.from_user.id}</code>\n\n"
-        "Управление ролями персонала:",
+        _PANEL_TEXT,
         parse_mode="HTML",
         reply_markup=get_director_panel_keyboard()
     )
 
 
-@router.callback_query(F.data == "director:add_admin")
+@_action("add_admin")
 async def director_add_admin_callback(callback: CallbackQuery, state: FSMContext):
     """Start adding admin process"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
+    await state.set_state(_WAIT_ADMIN)
     
-    await state.set_state(DirectorStates.waiting_admin_id)
-    
-    await callback.message.edit_text(
-        "➕ <b>Добавление администратора</b>\n\n"
-        "Введите Telegram ID пользователя:\n\n"
-        "<i>Пользователь может узнать свой ID, написав боту /start</i>\n\n"
-        "Отправьте /cancel для отмены.",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            _ADD_ADMIN_PROMPT,
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.message(DirectorStates.waiting_admin_id)
+@router.message(_WAIT_ADMIN)
 async def director_admin_id_handler(message: Message, state: FSMContext):
     """Handle admin ID input"""
-    if not is_director(message.from_user.id):
-        return
-    
     if message.text == "/cancel":
         await state.clear()
         await message.answer(
@@ -100,9 +153,8 @@ async def director_admin_id_handler(message: Message, state: FSMContext):
         )
         return
     
-    try:
-        user_id = int(message.text.strip())
-    except ValueError:
+    user_id = _parse_user_id(message.text)
+    if user_id is None:
         await message.answer("❌ Введите корректный числовой ID:")
         return
     
@@ -110,16 +162,11 @@ async def director_admin_id_handler(message: Message, state: FSMContext):
         await message.answer("❌ Нельзя изменить роль директора")
         return
     
-    # Check if user exists, if not - create
-    user = get_user(user_id)
-    if not user:
-        create_user(user_id, welcome_bonus=0)
-        user = get_user(user_id)
-    
-    # Update role
-    update_user_role(user_id, 'admin')
-    
-    await state.clear()
+    # Creates the user if needed and sets the role in one statement; the FSM
+    # reset doesn't depend on it, so both run at once
+    user, _ = await asyncio.gather(promote_user(user_id, 'admin'), state.clear())
+    invalidate_role(user_id)
+    invalidate_staff()
     
     name = user.get('first_name') or user.get('username') or str(user_id)
     
@@ -134,31 +181,23 @@ async def director_admin_id_handler(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "director:add_courier")
+@_action("add_courier")
 async def director_add_courier_callback(callback: CallbackQuery, state: FSMContext):
     """Start adding courier process"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    await state.set_state(DirectorStates.waiting_courier_id)
+    await state.set_state(_WAIT_COURIER)
     
-    await callback.message.edit_text(
-        "➕ <b>Добавление курьера</b>\n\n"
-        "Введите Telegram ID пользователя:\n\n"
-        "<i>Пользователь может узнать свой ID, написав боту /start</i>\n\n"
-        "Отправьте /cancel для отмены.",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            _ADD_COURIER_PROMPT,
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.message(DirectorStates.waiting_courier_id)
+@router.message(_WAIT_COURIER)
 async def director_courier_id_handler(message: Message, state: FSMContext):
     """Handle courier ID input"""
-    if not is_director(message.from_user.id):
-        return
-    
     if message.text == "/cancel":
         await state.clear()
         await message.answer(
@@ -167,9 +206,8 @@ async def director_courier_id_handler(message: Message, state: FSMContext):
         )
         return
     
-    try:
-        user_id = int(message.text.strip())
-    except ValueError:
+    user_id = _parse_user_id(message.text)
+    if user_id is None:
         await message.answer("❌ Введите корректный числовой ID:")
         return
     
@@ -177,16 +215,11 @@ async def director_courier_id_handler(message: Message, state: FSMContext):
         await message.answer("❌ Нельзя изменить роль директора")
         return
     
-    # Check if user exists, if not - create
-    user = get_user(user_id)
-    if not user:
-        create_user(user_id, welcome_bonus=0)
-        user = get_user(user_id)
-    
-    # Update role
-    update_user_role(user_id, 'courier')
-    
-    await state.clear()
+    # Creates the user if needed and sets the role in one statement; the FSM
+    # reset doesn't depend on it, so both run at once
+    user, _ = await asyncio.gather(promote_user(user_id, 'courier'), state.clear())
+    invalidate_role(user_id)
+    invalidate_staff()
     
     name = user.get('first_name') or user.get('username') or str(user_id)
     
@@ -201,81 +234,85 @@ async def director_courier_id_handler(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "director:list_roles")
-async def director_list_roles_callback(callback: CallbackQuery):
+@_action("list_roles")
+async def director_list_roles_callback(callback: CallbackQuery, state: FSMContext):
     """Show all users with roles"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    admins = get_users_by_role('admin')
-    couriers = get_users_by_role('courier')
-    
-    text = "📋 <b>Список ролей</b>\n\n"
+    director = None
+    admins, couriers = [], []
+    for user in await list_staff():
+        if user['telegram_id'] == DIRECTOR_ID:
+            director = user
+        elif user['role'] == 'admin':
+            admins.append(user)
+        else:
+            couriers.append(user)
     
-    text += "👑 <b>Директор:</b>\n"
-    director = get_user(DIRECTOR_ID)
     director_name = director.get('first_name') if director else "Не в базе"
-    text += f"  • {director_name} (ID: <code>{DIRECTOR_ID}</code>)\n\n"
-    
-    text += "🛠 <b>Администраторы:</b>\n"
+    parts = [
+        "📋 <b>Список ролей</b>\n\n",
+        "👑 <b>Директор:</b>\n",
+        f"  • {director_name} (ID: <code>{DIRECTOR_ID}</code>)\n\n",
+        "🛠 <b>Администраторы:</b>\n",
+    ]
     if admins:
-        for admin in admins:
-            name = admin.get('first_name') or admin.get('username') or 'Неизвестно'
-            text += f"  • {name} (ID: <code>{admin['telegram_id']}</code>)\n"
+        parts.extend(
+            f"  • {admin.get('first_name') or admin.get('username') or 'Неизвестно'}"
+            f" (ID: <code>{admin['telegram_id']}</code>)\n"
+            for admin in admins
+        )
     else:
-        text += "  <i>Нет администраторов</i>\n"
+        parts.append("  <i>Нет администраторов</i>\n")
     
-    text += "\n🚚 <b>Курьеры:</b>\n"
+    parts.append("\n🚚 <b>Курьеры:</b>\n")
     if couriers:
-        for courier in couriers:
-            name = courier.get('first_name') or courier.get('username') or 'Неизвестно'
-            text += f"  • {name} (ID: <code>{courier['telegram_id']}</code>)\n"
+        parts.extend(
+            f"  • {courier.get('first_name') or courier.get('username') or 'Неизвестно'}"
+            f" (ID: <code>{courier['telegram_id']}</code>)\n"
+            for courier in couriers
+        )
     else:
-        text += "  <i>Нет курьеров</i>\n"
+        parts.append("  <i>Нет курьеров</i>\n")
     
-    await callback.message.edit_text(
-        text,
-        parse_mode="HTML",
-        reply_markup=get_director_panel_keyboard()
+    text = "".join(parts)
+    
+    await gather_calls(
+        callback.message.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=get_director_panel_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data == "director:remove_role")
-async def director_remove_role_callback(callback: CallbackQuery):
+@_action("remove_role")
+async def director_remove_role_callback(callback: CallbackQuery, state: FSMContext):
     """Show users for role removal"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    admins = get_users_by_role('admin')
-    couriers = get_users_by_role('courier')
+    admins, couriers = [], []
+    for user in await list_staff():
+        if user['telegram_id'] != DIRECTOR_ID:
+            (admins if user['role'] == 'admin' else couriers).append(user)
     
-    all_staff = admins + couriers
-    
-    if not all_staff:
+    if not admins and not couriers:
         await callback.answer("Нет пользователей для удаления", show_alert=True)
         return
     
-    await callback.message.edit_text(
-        "❌ <b>Удаление роли</b>\n\n"
-        "Выберите пользователя для удаления роли:",
-        parse_mode="HTML",
-        reply_markup=get_role_list_keyboard(all_staff, "remove")
+    await gather_calls(
+        callback.message.edit_text(
+            "❌ <b>Удаление роли</b>\n\n"
+            "Выберите пользователя для удаления роли:",
+            parse_mode="HTML",
+            reply_markup=get_role_list_keyboard(chain(admins, couriers), "remove")
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:confirm_remove:"))
-async def director_confirm_remove_callback(callback: CallbackQuery):
+@_action("confirm_remove")
+async def director_confirm_remove_callback(callback: CallbackQuery, state: FSMContext):
     """Confirm role removal"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    user_id = int(callback.data.split(":")[2])
-    user = get_user(user_id)
+    user_id = int(callback.data.rpartition(":")[2])
+    user = await get_user(user_id)
     
     if not user:
         await callback.answer("Пользователь не найден", show_alert=True)
@@ -285,191 +322,182 @@ async def director_confirm_remove_callback(callback: CallbackQuery):
         await callback.answer("Нельзя удалить роль директора", show_alert=True)
         return
     
-    role_name = {'admin': '🛠 Администратор', 'courier': '🚚 Курьер'}.get(user['role'], user['role'])
+    role_name = _ROLE_NAMES.get(user['role'], user['role'])
     name = user.get('first_name') or user.get('username') or str(user_id)
-    
-    await callback.message.edit_text(
-        f"❌ <b>Подтверждение удаления роли</b>\n\n"
-        f"👤 Пользователь: {name}\n"
-        f"🆔 ID: <code>{user_id}</code>\n"
-        f"👔 Текущая роль: {role_name}\n\n"
-        f"Подтвердите удаление роли (станет обычным пользователем):",
-        parse_mode="HTML",
-        reply_markup=get_confirm_role_action_keyboard(user_id, "remove")
+    # Remembered for the confirm button, so removal doesn't look the user up again
+    await state.update_data(remove_user_id=user_id, remove_name=name)
+    
+    await gather_calls(
+        callback.message.edit_text(
+            f"❌ <b>Подтверждение удаления роли</b>\n\n"
+            f"👤 Пользователь: {name}\n"
+            f"🆔 ID: <code>{user_id}</code>\n"
+            f"👔 Текущая роль: {role_name}\n\n"
+            f"Подтвердите удаление роли (станет обычным пользователем):",
+            parse_mode="HTML",
+            reply_markup=get_confirm_role_action_keyboard(user_id, "remove")
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:do_remove:"))
-async def director_do_remove_callback(callback: CallbackQuery):
+@_action("do_remove")
+async def director_do_remove_callback(callback: CallbackQuery, state: FSMContext):
     """Execute role removal"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    user_id = int(callback.data.split(":")[2])
+    user_id = int(callback.data.rpartition(":")[2])
     
     if user_id == DIRECTOR_ID:
         await callback.answer("Нельзя удалить роль директора", show_alert=True)
         return
     
-    user = get_user(user_id)
-    name = user.get('first_name') if user else str(user_id)
-    
-    update_user_role(user_id, 'user')
-    
-    await callback.message.edit_text(
-        f"✅ <b>Роль удалена!</b>\n\n"
-        f"👤 Пользователь: {name}\n"
-        f"🆔 ID: <code>{user_id}</code>\n"
-        f"👔 Новая роль: 👤 Пользователь",
-        parse_mode="HTML",
-        reply_markup=get_director_panel_keyboard()
+    data = await state.get_data()
+    if data.get('remove_user_id') == user_id:
+        name = data['remove_name']
+    else:
+        # Confirmation shown before a restart or for another user
+        user = await get_user(user_id)
+        name = user.get('first_name') if user else str(user_id)
+    
+    await update_user_role(user_id, 'user')
+    invalidate_role(user_id)
+    invalidate_staff()
+    
+    await gather_calls(
+        callback.message.edit_text(
+            f"✅ <b>Роль удалена!</b>\n\n"
+            f"👤 Пользователь: {name}\n"
+            f"🆔 ID: <code>{user_id}</code>\n"
+            f"👔 Новая роль: 👤 Пользователь",
+            parse_mode="HTML",
+            reply_markup=get_director_panel_keyboard()
+        ),
+        callback.answer("Роль удалена")
     )
-    await callback.answer("Роль удалена")
 
 
-@router.callback_query(F.data == "director:back")
+@_action("back")
 async def director_back_callback(callback: CallbackQuery, state: FSMContext):
     """Back to director panel"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
     await state.clear()
     
-    await callback.message.edit_text(
-        "👑 <b>Панель директора</b>\n\n"
-        f"🆔 Ваш ID: <code>{callback.from_user.id}</code>\n\n"
-        "Управление ролями персонала:",
-        parse_mode="HTML",
-        reply_markup=get_director_panel_keyboard()
+    # A repeated "back" on a message already showing the panel costs no API call
+    await gather_calls(
+        edit_if_changed(
+            callback.message, _PANEL_TEXT, _PANEL_DIGEST, get_director_panel_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data == "director:close")
+@_action("close")
 async def director_close_callback(callback: CallbackQuery, state: FSMContext):
     """Close director panel"""
     await state.clear()
-    await callback.message.delete()
-    await callback.answer()
+    await gather_calls(callback.message.delete(), callback.answer())
 
 
 # ============ STAFF MANAGEMENT SUBMENU ============
 
-@router.callback_query(F.data == "director:staff_menu")
-async def director_staff_menu_callback(callback: CallbackQuery):
+@_action("staff_menu")
+async def director_staff_menu_callback(callback: CallbackQuery, state: FSMContext):
     """Show staff management submenu"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    await callback.message.edit_text(
-        "👥 <b>Управление персоналом</b>\n\n"
-        "Выберите действие:",
-        parse_mode="HTML",
-        reply_markup=get_director_staff_keyboard()
+    await gather_calls(
+        callback.message.edit_text(
+            "👥 <b>Управление персоналом</b>\n\n"
+            "Выберите действие:",
+            parse_mode="HTML",
+            reply_markup=get_director_staff_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 # ============ MENU MANAGEMENT ============
 
-@router.callback_query(F.data == "director:menu_management")
-async def director_menu_management_callback(callback: CallbackQuery):
+@_action("menu_management")
+async def director_menu_management_callback(callback: CallbackQuery, state: FSMContext):
     """Show menu management submenu"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    await callback.message.edit_text(
-        "🍽 <b>Управление меню</b>\n\n"
-        "Все изменения автоматически отображаются в Mini App.\n\n"
-        "Выберите действие:",
-        parse_mode="HTML",
-        reply_markup=get_director_menu_management_keyboard()
+    await gather_calls(
+        callback.message.edit_text(
+            "🍽 <b>Управление меню</b>\n\n"
+            "Все изменения автоматически отображаются в Mini App.\n\n"
+            "Выберите действие:",
+            parse_mode="HTML",
+            reply_markup=get_director_menu_management_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data == "director:list_dishes")
-async def director_list_dishes_callback(callback: CallbackQuery):
+@_action("list_dishes")
+async def director_list_dishes_callback(callback: CallbackQuery, state: FSMContext):
     """Show all dishes"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    items = get_menu_items()
+    items = await get_menu_with_categories()
     
     if not items:
         await callback.answer("Меню пусто", show_alert=True)
         return
     
-    text = "📋 <b>Список блюд:</b>\n\n"
-    categories = get_categories()
-    
-    for cat in categories:
-        cat_items = [i for i in items if i['category_id'] == cat['id']]
-        if cat_items:
-            text += f"\n<b>{cat['emoji']} {cat['name']}:</b>\n"
-            for item in cat_items:
-                status = "✅" if item.get('is_available', 1) else "❌"
-                text += f"  {status} {item['name']} — {item['price']}₽\n"
+    # Rows come ordered by category: emit a header whenever it changes
+    parts = ["📋 <b>Список блюд:</b>\n\n"]
+    category_id = None
+    for item in items:
+        if item['category_id'] != category_id:
+            category_id = item['category_id']
+            parts.append(f"\n<b>{item['category_emoji']} {item['category_name']}:</b>\n")
+        parts.append(
+            f"  {'✅' if item.get('is_available', 1) else '❌'} {item['name']} — {item['price']}₽\n"
+        )
+    text = "".join(parts)
     
-    await callback.message.edit_text(
-        text,
-        parse_mode="HTML",
-        reply_markup=get_director_menu_management_keyboard()
+    await gather_calls(
+        callback.message.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=get_director_menu_management_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 # ============ ADD DISH ============
 
-@router.callback_query(F.data == "director:add_dish")
+@_action("add_dish")
 async def director_add_dish_callback(callback: CallbackQuery, state: FSMContext):
     """Start adding dish - select category"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    categories = get_categories()
+    categories = await get_categories()
     
-    await callback.message.edit_text(
-        "➕ <b>Добавление блюда</b>\n\n"
-        "Шаг 1/5: Выберите категорию:",
-        parse_mode="HTML",
-        reply_markup=get_category_select_keyboard(categories, "director_add")
+    await gather_calls(
+        callback.message.edit_text(
+            "➕ <b>Добавление блюда</b>\n\n"
+            "Шаг 1/5: Выберите категорию:",
+            parse_mode="HTML",
+            reply_markup=get_category_select_keyboard(categories, "director_add")
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("admin:director_add_category:"))
 async def director_select_category_callback(callback: CallbackQuery, state: FSMContext):
     """Category selected for new dish"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    category_id = int(callback.data.split(":")[2])
+    category_id = int(callback.data.rpartition(":")[2])
     await state.update_data(new_dish_category=category_id)
     await state.set_state(DirectorStates.waiting_dish_name)
     
-    await callback.message.edit_text(
-        "➕ <b>Добавление блюда</b>\n\n"
-        "Шаг 2/5: Введите название блюда:",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            "➕ <b>Добавление блюда</b>\n\n"
+            "Шаг 2/5: Введите название блюда:",
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.message(DirectorStates.waiting_dish_name)
 async def director_dish_name_handler(message: Message, state: FSMContext):
     """Handle dish name input"""
-    if not is_director(message.from_user.id):
-        return
-    
     if message.text == "/cancel":
         await state.clear()
         await message.answer("❌ Отменено", reply_markup=get_director_menu_management_keyboard())
@@ -488,9 +516,6 @@ async def director_dish_name_handler(message: Message, state: FSMContext):
 @router.message(DirectorStates.waiting_dish_price)
 async def director_dish_price_handler(message: Message, state: FSMContext):
     """Handle dish price input"""
-    if not is_director(message.from_user.id):
-        return
-    
     if message.text == "/cancel":
         await state.clear()
         await message.answer("❌ Отменено")
@@ -518,9 +543,6 @@ async def director_dish_price_handler(message: Message, state: FSMContext):
 @router.message(DirectorStates.waiting_dish_description)
 async def director_dish_description_handler(message: Message, state: FSMContext):
     """Handle dish description input"""
-    if not is_director(message.from_user.id):
-        return
-    
     description = message.text if message.text != "-" else ""
     await state.update_data(new_dish_description=description)
     await state.set_state(DirectorStates.waiting_dish_image)
@@ -536,15 +558,12 @@ async def director_dish_description_handler(message: Message, state: FSMContext)
 @router.message(DirectorStates.waiting_dish_image)
 async def director_dish_image_handler(message: Message, state: FSMContext):
     """Handle dish image URL and create dish"""
-    if not is_director(message.from_user.id):
-        return
-    
     image_url = message.text if message.text != "-" else None
     
     data = await state.get_data()
     
     # Create dish in database
-    item_id = add_menu_item(
+    item_id = await add_menu_item(
         category_id=data['new_dish_category'],
         name=data['new_dish_name'],
         description=data.get('new_dish_description', ''),
@@ -569,86 +588,80 @@ async def director_dish_image_handler(message: Message, state: FSMContext):
 
 # ============ EDIT DISH ============
 
-@router.callback_query(F.data == "director:edit_dish")
-async def director_edit_dish_callback(callback: CallbackQuery):
+@_action("edit_dish")
+async def director_edit_dish_callback(callback: CallbackQuery, state: FSMContext):
     """Show dishes for editing"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    items = get_menu_items()
+    items = await get_menu_items()
     
     if not items:
         await callback.answer("Меню пусто", show_alert=True)
         return
     
-    await callback.message.edit_text(
-        "✏️ <b>Изменение блюда</b>\n\n"
-        "Выберите блюдо для редактирования:",
-        parse_mode="HTML",
-        reply_markup=get_dish_list_keyboard(items, "edit")
+    await gather_calls(
+        callback.message.edit_text(
+            "✏️ <b>Изменение блюда</b>\n\n"
+            "Выберите блюдо для редактирования:",
+            parse_mode="HTML",
+            reply_markup=get_dish_list_keyboard(items, "edit")
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:edit_dish_id:"))
-async def director_edit_dish_id_callback(callback: CallbackQuery):
-    """Show edit options for selected dish"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
-    item = get_menu_item(item_id)
-    
-    if not item:
-        await callback.answer("Блюдо не найдено", show_alert=True)
-        return
-    
+async def _show_dish(message: Message, item: Dict[str, Any]):
+    """Show the dish edit screen, unless the message already shows it"""
     status = "✅ Доступно" if item.get('is_available', 1) else "❌ Недоступно"
-    
-    await callback.message.edit_text(
+    text = (
         f"✏️ <b>Редактирование блюда</b>\n\n"
         f"🆔 ID: {item['id']}\n"
         f"📛 Название: {item['name']}\n"
         f"💰 Цена: {item['price']}₽\n"
         f"📄 Описание: {item.get('description') or 'Нет'}\n"
         f"📊 Статус: {status}\n\n"
-        f"Выберите что изменить:",
-        parse_mode="HTML",
-        reply_markup=get_dish_edit_keyboard(item_id)
+        f"Выберите что изменить:"
+    )
+    await edit_if_changed(
+        message, text, hashlib.sha1(text.encode()).hexdigest(),
+        get_dish_edit_keyboard(item['id'])
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:edit_name:"))
-async def director_edit_name_callback(callback: CallbackQuery, state: FSMContext):
-    """Start editing dish name"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
+@_action("edit_dish_id")
+async def director_edit_dish_id_callback(callback: CallbackQuery, state: FSMContext):
+    """Show edit options for selected dish"""
+    item_id = int(callback.data.rpartition(":")[2])
+    item = await get_menu_item(item_id)
+    
+    if not item:
+        await callback.answer("Блюдо не найдено", show_alert=True)
         return
     
-    item_id = int(callback.data.split(":")[2])
+    await gather_calls(_show_dish(callback.message, item), callback.answer())
+
+
+@_action("edit_name")
+async def director_edit_name_callback(callback: CallbackQuery, state: FSMContext):
+    """Start editing dish name"""
+    item_id = int(callback.data.rpartition(":")[2])
     await state.update_data(editing_dish_id=item_id)
     await state.set_state(DirectorStates.waiting_edit_name)
     
-    await callback.message.edit_text(
-        "📝 Введите новое название блюда:",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            "📝 Введите новое название блюда:",
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.message(DirectorStates.waiting_edit_name)
 async def director_edit_name_handler(message: Message, state: FSMContext):
     """Handle new dish name"""
-    if not is_director(message.from_user.id):
-        return
-    
     data = await state.get_data()
     item_id = data['editing_dish_id']
     
-    update_menu_item(item_id, name=message.text)
+    await update_menu_item(item_id, name=message.text)
     await state.clear()
     
     await message.answer(
@@ -658,30 +671,25 @@ async def director_edit_name_handler(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("director:edit_price:"))
+@_action("edit_price")
 async def director_edit_price_callback(callback: CallbackQuery, state: FSMContext):
     """Start editing dish price"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
+    item_id = int(callback.data.rpartition(":")[2])
     await state.update_data(editing_dish_id=item_id)
     await state.set_state(DirectorStates.waiting_edit_price)
     
-    await callback.message.edit_text(
-        "💰 Введите новую цену (число в рублях):",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            "💰 Введите новую цену (число в рублях):",
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.message(DirectorStates.waiting_edit_price)
 async def director_edit_price_handler(message: Message, state: FSMContext):
     """Handle new dish price"""
-    if not is_director(message.from_user.id):
-        return
-    
     try:
         price = int(message.text.strip())
         if price <= 0:
@@ -693,7 +701,7 @@ async def director_edit_price_handler(message: Message, state: FSMContext):
     data = await state.get_data()
     item_id = data['editing_dish_id']
     
-    update_menu_item(item_id, price=price)
+    await update_menu_item(item_id, price=price)
     await state.clear()
     
     await message.answer(
@@ -703,34 +711,29 @@ async def director_edit_price_handler(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("director:edit_desc:"))
+@_action("edit_desc")
 async def director_edit_desc_callback(callback: CallbackQuery, state: FSMContext):
     """Start editing dish description"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
+    item_id = int(callback.data.rpartition(":")[2])
     await state.update_data(editing_dish_id=item_id)
     await state.set_state(DirectorStates.waiting_edit_description)
     
-    await callback.message.edit_text(
-        "📄 Введите новое описание блюда:",
-        parse_mode="HTML"
+    await gather_calls(
+        callback.message.edit_text(
+            "📄 Введите новое описание блюда:",
+            parse_mode="HTML"
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.message(DirectorStates.waiting_edit_description)
 async def director_edit_desc_handler(message: Message, state: FSMContext):
     """Handle new dish description"""
-    if not is_director(message.from_user.id):
-        return
-    
     data = await state.get_data()
     item_id = data['editing_dish_id']
     
-    update_menu_item(item_id, description=message.text)
+    await update_menu_item(item_id, description=message.text)
     await state.clear()
     
     await message.answer(
@@ -740,82 +743,55 @@ async def director_edit_desc_handler(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("director:toggle_avail:"))
-async def director_toggle_avail_callback(callback: CallbackQuery):
+@_action("toggle_avail")
+async def director_toggle_avail_callback(callback: CallbackQuery, state: FSMContext):
     """Toggle dish availability"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
-    item = get_menu_item(item_id)
+    item_id = int(callback.data.rpartition(":")[2])
+    # Flipped in SQL; the updated row comes back for the refreshed view
+    item = await toggle_menu_item_availability(item_id)
     
     if not item:
         await callback.answer("Блюдо не найдено", show_alert=True)
         return
     
-    new_status = 0 if item.get('is_available', 1) else 1
-    update_menu_item(item_id, is_available=new_status)
-    
-    status_text = "✅ Блюдо включено" if new_status else "❌ Блюдо отключено"
-    await callback.answer(status_text)
-    
-    # Refresh view
-    item = get_menu_item(item_id)
-    status = "✅ Доступно" if item.get('is_available', 1) else "❌ Недоступно"
-    
-    await callback.message.edit_text(
-        f"✏️ <b>Редактирование блюда</b>\n\n"
-        f"🆔 ID: {item['id']}\n"
-        f"📛 Название: {item['name']}\n"
-        f"💰 Цена: {item['price']}₽\n"
-        f"📄 Описание: {item.get('description') or 'Нет'}\n"
-        f"📊 Статус: {status}\n\n"
-        f"Выберите что изменить:",
-        parse_mode="HTML",
-        reply_markup=get_dish_edit_keyboard(item_id)
-    )
+    status_text = "✅ Блюдо включено" if item['is_available'] else "❌ Блюдо отключено"
+    await gather_calls(callback.answer(status_text), _show_dish(callback.message, item))
 
 
 # ============ EDIT IMAGE ============
 
-@router.callback_query(F.data.startswith("director:edit_image:"))
+@_action("edit_image")
 async def director_edit_image_callback(callback: CallbackQuery, state: FSMContext):
     """Start editing dish image"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
+    item_id = int(callback.data.rpartition(":")[2])
     await state.update_data(editing_dish_id=item_id)
     await state.set_state(DirectorStates.waiting_edit_image)
     
-    await callback.message.edit_text(
-        "🖼 <b>Изменение фото блюда</b>\n\n"
-        "Отправьте ссылку на изображение (URL).\n\n"
-        "💡 <b>Как получить ссылку:</b>\n"
-        "1. Загрузите фото на <a href='https://imgbb.com/'>imgbb.com</a>\n"
-        "2. Скопируйте «Direct link» (прямую ссылку)\n"
-        "3. Отправьте эту ссылку сюда\n\n"
-        "Или отправьте <code>-</code> чтобы убрать фото.",
-        parse_mode="HTML",
-        disable_web_page_preview=True
+    await gather_calls(
+        callback.message.edit_text(
+            "🖼 <b>Изменение фото блюда</b>\n\n"
+            "Отправьте ссылку на изображение (URL).\n\n"
+            "💡 <b>Как получить ссылку:</b>\n"
+            "1. Загрузите фото на <a href='https://imgbb.com/'>imgbb.com</a>\n"
+            "2. Скопируйте «Direct link» (прямую ссылку)\n"
+            "3. Отправьте эту ссылку сюда\n\n"
+            "Или отправьте <code>-</code> чтобы убрать фото.",
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
 @router.message(DirectorStates.waiting_edit_image)
 async def director_edit_image_handler(message: Message, state: FSMContext):
     """Handle new dish image URL"""
-    if not is_director(message.from_user.id):
-        return
-    
     data = await state.get_data()
     item_id = data['editing_dish_id']
     
     # Если отправили "-" — убираем фото
     if message.text.strip() == "-":
-        update_menu_item(item_id, image_url=None)
+        await update_menu_item(item_id, image_url=None)
         await state.clear()
         await message.answer(
             "✅ Фото удалено!",
@@ -833,7 +809,7 @@ async def director_edit_image_handler(message: Message, state: FSMContext):
         )
         return
     
-    update_menu_item(item_id, image_url=image_url)
+    await update_menu_item(item_id, image_url=image_url)
     await state.clear()
     
     await message.answer(
@@ -846,161 +822,118 @@ async def director_edit_image_handler(message: Message, state: FSMContext):
 
 # ============ DELETE DISH ============
 
-@router.callback_query(F.data == "director:delete_dish")
-async def director_delete_dish_callback(callback: CallbackQuery):
+@_action("delete_dish")
+async def director_delete_dish_callback(callback: CallbackQuery, state: FSMContext):
     """Show dishes for deletion"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    items = get_menu_items()
+    items = await get_menu_items()
     
     if not items:
         await callback.answer("Меню пусто", show_alert=True)
         return
     
-    await callback.message.edit_text(
-        "❌ <b>Удаление блюда</b>\n\n"
-        "Выберите блюдо для удаления:",
-        parse_mode="HTML",
-        reply_markup=get_dish_list_keyboard(items, "confirm_delete")
+    await gather_calls(
+        callback.message.edit_text(
+            "❌ <b>Удаление блюда</b>\n\n"
+            "Выберите блюдо для удаления:",
+            parse_mode="HTML",
+            reply_markup=get_dish_list_keyboard(items, "confirm_delete")
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:confirm_delete_dish_id:"))
-async def director_confirm_delete_callback(callback: CallbackQuery):
+@_action("confirm_delete_dish_id")
+async def director_confirm_delete_callback(callback: CallbackQuery, state: FSMContext):
     """Confirm dish deletion"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
-    item = get_menu_item(item_id)
+    item_id = int(callback.data.rpartition(":")[2])
+    item = await get_menu_item(item_id)
     
     if not item:
         await callback.answer("Блюдо не найдено", show_alert=True)
         return
     
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Да, удалить", callback_data=f"director:do_delete_dish:{item_id}")
-    builder.button(text="❌ Отмена", callback_data="director:delete_dish")
-    builder.adjust(2)
-    
-    await callback.message.edit_text(
-        f"❌ <b>Подтверждение удаления</b>\n\n"
-        f"Вы уверены, что хотите удалить:\n"
-        f"📛 {item['name']} — {item['price']}₽?",
-        parse_mode="HTML",
-        reply_markup=builder.as_markup()
+    await gather_calls(
+        callback.message.edit_text(
+            f"❌ <b>Подтверждение удаления</b>\n\n"
+            f"Вы уверены, что хотите удалить:\n"
+            f"📛 {item['name']} — {item['price']}₽?",
+            parse_mode="HTML",
+            reply_markup=get_confirm_delete_dish_keyboard(item_id)
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("director:do_delete_dish:"))
-async def director_do_delete_callback(callback: CallbackQuery):
+@_action("do_delete_dish")
+async def director_do_delete_callback(callback: CallbackQuery, state: FSMContext):
     """Execute dish deletion"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    item_id = int(callback.data.split(":")[2])
-    item = get_menu_item(item_id)
+    item_id = int(callback.data.rpartition(":")[2])
+    item = await get_menu_item(item_id)
     name = item['name'] if item else "Блюдо"
     
-    delete_menu_item(item_id)
+    await delete_menu_item(item_id)
     
-    await callback.message.edit_text(
-        f"✅ Блюдо <b>{name}</b> удалено!",
-        parse_mode="HTML",
-        reply_markup=get_director_menu_management_keyboard()
+    await gather_calls(
+        callback.message.edit_text(
+            f"✅ Блюдо <b>{name}</b> удалено!",
+            parse_mode="HTML",
+            reply_markup=get_director_menu_management_keyboard()
+        ),
+        callback.answer("Блюдо удалено")
     )
-    await callback.answer("Блюдо удалено")
 
 
 # ============ ORDERS & STATS FOR DIRECTOR ============
 
-@router.callback_query(F.data == "director:all_orders")
-async def director_all_orders_callback(callback: CallbackQuery):
+@_action("all_orders")
+async def director_all_orders_callback(callback: CallbackQuery, state: FSMContext):
     """Show all orders for director"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    from database import get_pending_orders
-    orders = get_pending_orders()
+    orders = await get_pending_orders(limit=15)
     
     if not orders:
-        await callback.message.edit_text(
-            "📋 <b>Заказы</b>\n\n"
-            "Нет активных заказов.",
-            parse_mode="HTML",
-            reply_markup=get_director_panel_keyboard()
+        await gather_calls(
+            callback.message.edit_text(
+                "📋 <b>Заказы</b>\n\n"
+                "Нет активных заказов.",
+                parse_mode="HTML",
+                reply_markup=get_director_panel_keyboard()
+            ),
+            callback.answer()
         )
-        await callback.answer()
         return
     
-    STATUS_NAMES = {
-        'pending': '⏳ Ожидает',
-        'confirmed': '✅ Подтверждён',
-        'cooking': '👨‍🍳 Готовится',
-        'ready': '📦 Готов',
-        'delivering': '🚚 Доставляется',
-    }
-    
-    text = "📋 <b>Активные заказы:</b>\n\n"
-    for order in orders[:15]:
-        text += (
-            f"#{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
-            f"👤 {order.get('first_name', 'Клиент')} | {order['total_price']}₽\n\n"
-        )
+    text = "📋 <b>Активные заказы:</b>\n\n" + "".join(
+        f"#{order['id']} | {STATUS_NAMES.get(order['status'], order['status'])}\n"
+        f"👤 {order.get('first_name', 'Клиент')} | {order['total_price']}₽\n\n"
+        for order in orders
+    )
     
-    await callback.message.edit_text(
-        text,
-        parse_mode="HTML",
-        reply_markup=get_director_panel_keyboard()
+    await gather_calls(
+        callback.message.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=get_director_panel_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
 
 
-@router.callback_query(F.data == "director:stats")
-async def director_stats_callback(callback: CallbackQuery):
+@_action("stats")
+async def director_stats_callback(callback: CallbackQuery, state: FSMContext):
     """Show statistics for director"""
-    if not is_director(callback.from_user.id):
-        await callback.answer("⛔ Нет доступа", show_alert=True)
-        return
-    
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM orders")
-        total_orders = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE date(created_at) = date('now')")
-        today_orders = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COALESCE(SUM(total_price), 0) FROM orders WHERE status = 'delivered'")
-        total_revenue = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM menu_items WHERE is_available = 1")
-        active_dishes = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status NOT IN ('delivered', 'cancelled')")
-        active_orders = cursor.fetchone()[0]
-    
-    await callback.message.edit_text(
-        "📊 <b>Статистика кафе</b>\n\n"
-        f"👥 Клиентов: {total_users}\n"
-        f"🍽 Активных блюд: {active_dishes}\n\n"
-        f"📦 Всего заказов: {total_orders}\n"
-        f"📦 Заказов сегодня: {today_orders}\n"
-        f"⏳ Активных заказов: {active_orders}\n\n"
-        f"💰 Общая выручка: {total_revenue}₽",
-        parse_mode="HTML",
-        reply_markup=get_director_panel_keyboard()
+    stats = await get_order_stats()
+    
+    await gather_calls(
+        callback.message.edit_text(
+            "📊 <b>Статистика кафе</b>\n\n"
+            f"👥 Клиентов: {stats['total_customers']}\n"
+            f"🍽 Активных блюд: {stats['active_dishes']}\n\n"
+            f"📦 Всего заказов: {stats['total_orders']}\n"
+            f"📦 Заказов сегодня: {stats['today_orders']}\n"
+            f"⏳ Активных заказов: {stats['active_orders']}\n\n"
+            f"💰 Общая выручка: {stats['total_revenue']}₽",
+            parse_mode="HTML",
+            reply_markup=get_director_panel_keyboard()
+        ),
+        callback.answer()
     )
-    await callback.answer()
@@ -8,16 +8,22 @@ from aiogram.types import Message, CallbackQuery, ContentType
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import json
+import hashlib
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict
 
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import orjson
 
-from database import (
-    get_user, create_user, update_user_address, update_user_phone,
-    get_user_orders, get_order, update_order_status
+from db_async import (
+    get_user, get_or_create_user, update_user_address, update_user_phone,
+    get_user_order_summaries, get_order, cancel_order_if_pending
 )
+from auth import DENIED_TEXT
+from callbacks import OrderViewCB, CourierCB
+from constants import ADMIN_ROLES, COURIER_ROLES
+from notifier import notify
+from utils import edit_if_changed
 from keyboards import (
     get_main_menu_keyboard, get_share_phone_keyboard,
     get_order_status_keyboard, get_user_orders_keyboard,
@@ -26,6 +32,7 @@ from keyboards import (
 )
 
 router = Router()
+logger = logging.getLogger(__name__)
 
 
 class UserStates(StatesGroup):
@@ -46,6 +53,63 @@ STATUS_NAMES = {
 }
 
 
+# Static reply texts, built once; templates take the user's name and balances
+_WELCOME_STAFF = {
+    'director': (
+        "👑 Добро пожаловать, Директор {name}!\n\n"
+        "Используйте панель управления для:\n"
+        "• Управления персоналом\n"
+        "• Просмотра заказов\n"
+        "• Редактирования меню\n"
+        "• Просмотра статистики"
+    ),
+    'admin': (
+        "🛠 Добро пожаловать, Администратор {name}!\n\n"
+        "Ваши возможности:\n"
+        "• Управление заказами\n"
+        "• Редактирование меню\n"
+        "• Назначение курьеров\n"
+        "• Просмотр статистики"
+    ),
+    'courier': (
+        "🚚 Добро пожаловать, Курьер {name}!\n\n"
+        "Ваши возможности:\n"
+        "• Просмотр назначенных доставок\n"
+        "• Отметка о получении заказа\n"
+        "• Отметка о доставке"
+    ),
+}
+_WELCOME_BACK = (
+    "👋 С возвращением, {name}!\n\n"
+    "💰 Ваш баланс:\n"
+    "🎁 Бонусы: {bonus}₽\n"
+    "💵 Кешбэк: {cashback}₽\n\n"
+    "Нажмите «Открыть меню» чтобы сделать заказ!"
+)
+_WELCOME_NEW = (
+    "🎉 Добро пожаловать в наше кафе, {name}!\n\n"
+    "🎁 Вам начислено 500 приветственных бонусов!\n\n"
+    "ℹ️ Бонусами можно оплатить до 50% заказа.\n"
+    "Минимальная сумма заказа для использования бонусов: 500₽\n\n"
+    "Нажмите «Открыть меню» чтобы сделать первый заказ!"
+)
+_BALANCE_TEMPLATE = (
+    "💰 <b>Ваш баланс</b>\n\n"
+    "🎁 Бонусы: <b>{bonus}₽</b>\n"
+    "<i>Можно использовать до 50% от суммы заказа (мин. 500₽)</i>\n\n"
+    "💵 Кешбэк: <b>{cashback}₽</b>\n"
+    "<i>Начисляется 5% с каждого заказа</i>"
+)
+_CONTACTS_TEXT = (
+    "📞 <b>Контакты</b>\n\n"
+    "📍 Адрес: г. Москва, ул. Примерная, д. 1\n"
+    "📱 Телефон: +7 (999) 123-45-67\n"
+    "⏰ Время работы: 09:00 - 23:00\n\n"
+    "📲 Наш канал: @your_channel\n"
+    "💬 Поддержка: @your_support"
+)
+
+
 @router.message(CommandStart())
 async def cmd_start(message: Message):
     """Handle /start command - register user and show welcome based on role"""
@@ -54,63 +118,26 @@ async def cmd_start(message: Message):
     first_name = message.from_user.first_name
     last_name = message.from_user.last_name
     
-    # Check if user exists
-    existing_user = get_user(user_id)
+    # New users are registered with the welcome bonus in the same call
+    user, is_new = await get_or_create_user(
+        user_id, username, first_name, last_name, welcome_bonus=500
+    )
     
-    if existing_user:
-        role = existing_user.get('role', 'user')
-        keyboard = get_keyboard_by_role(role)
-        
-        # Different welcome messages based on role
-        if role == 'director':
-            await message.answer(
-                f"👑 Добро пожаловать, Директор {first_name}!\n\n"
-                f"Используйте панель управления для:\n"
-                f"• Управления персоналом\n"
-                f"• Просмотра заказов\n"
-                f"• Редактирования меню\n"
-                f"• Просмотра статистики",
-                reply_markup=keyboard
-            )
-        elif role == 'admin':
-            await message.answer(
-                f"🛠 Добро пожаловать, Администратор {first_name}!\n\n"
-                f"Ваши возможности:\n"
-                f"• Управление заказами\n"
-                f"• Редактирование меню\n"
-                f"• Назначение курьеров\n"
-                f"• Просмотр статистики",
-                reply_markup=keyboard
-            )
-        elif role == 'courier':
-            await message.answer(
-                f"🚚 Добро пожаловать, Курьер {first_name}!\n\n"
-                f"Ваши возможности:\n"
-                f"• Просмотр назначенных доставок\n"
-                f"• Отметка о получении заказа\n"
-                f"• Отметка о доставке",
-                reply_markup=keyboard
-            )
-        else:
-            # Regular user
-            await message.answer(
-                f"👋 С возвращением, {first_name}!\n\n"
-                f"💰 Ваш баланс:\n"
-                f"🎁 Бонусы: {existing_user['balance_bonus']}₽\n"
-                f"💵 Кешбэк: {existing_user['balance_cashback']}₽\n\n"
-                f"Нажмите «Открыть меню» чтобы сделать заказ!",
-                reply_markup=keyboard
-            )
+    if not is_new:
+        role = user.get('role', 'user')
+        # Staff get a role-specific greeting, everyone else their balance
+        template = _WELCOME_STAFF.get(role, _WELCOME_BACK)
+        await message.answer(
+            template.format(
+                name=first_name,
+                bonus=user['balance_bonus'],
+                cashback=user['balance_cashback']
+            ),
+            reply_markup=get_keyboard_by_role(role)
+        )
     else:
-        # New user - give welcome bonus
-        create_user(user_id, username, first_name, last_name, welcome_bonus=500)
-        
         await message.answer(
-            f"🎉 Добро пожаловать в наше кафе, {first_name}!\n\n"
-            f"🎁 Вам начислено 500 приветственных бонусов!\n\n"
-            f"ℹ️ Бонусами можно оплатить до 50% заказа.\n"
-            f"Минимальная сумма заказа для использования бонусов: 500₽\n\n"
-            f"Нажмите «Открыть меню» чтобы сделать первый заказ!",
+            _WELCOME_NEW.format(name=first_name),
             reply_markup=get_main_menu_keyboard()
         )
 
@@ -118,7 +145,7 @@ async def cmd_start(message: Message):
 @router.message(F.text == "👤 Профиль")
 async def profile_handler(message: Message):
     """Show user profile"""
-    user = get_user(message.from_user.id)
+    user = await get_user(message.from_user.id)
     
     if not user:
         await message.answer("Пожалуйста, начните с команды /start")
@@ -149,18 +176,14 @@ async def profile_handler(message: Message):
 @router.message(F.text == "💰 Баланс")
 async def balance_handler(message: Message):
     """Show user balance"""
-    user = get_user(message.from_user.id)
+    user = await get_user(message.from_user.id)
     
     if not user:
         await message.answer("Пожалуйста, начните с команды /start")
         return
     
     await message.answer(
-        f"💰 <b>Ваш баланс</b>\n\n"
-        f"🎁 Бонусы: <b>{user['balance_bonus']}₽</b>\n"
-        f"<i>Можно использовать до 50% от суммы заказа (мин. 500₽)</i>\n\n"
-        f"💵 Кешбэк: <b>{user['balance_cashback']}₽</b>\n"
-        f"<i>Начисляется 5% с каждого заказа</i>",
+        _BALANCE_TEMPLATE.format(bonus=user['balance_bonus'], cashback=user['balance_cashback']),
         parse_mode="HTML"
     )
 
@@ -169,7 +192,8 @@ async def balance_handler(message: Message):
 async def my_orders_handler(message: Message):
     """Show user orders"""
     user_id = message.from_user.id
-    orders = get_user_orders(user_id)
+    # Only what the order buttons show, for the orders that fit on the keyboard
+    orders = await get_user_order_summaries(user_id)
     
     if not orders:
         await message.answer(
@@ -186,89 +210,83 @@ async def my_orders_handler(message: Message):
     )
 
 
-@router.callback_query(F.data.startswith("view_order:"))
-async def view_order_callback(callback: CallbackQuery):
-    """View order details"""
-    order_id = int(callback.data.split(":")[1])
-    order = get_order(order_id)
-    
-    if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
-        return
-    
-    # Format items
-    items_text = "\n".join([
+def _format_order_text(order: dict) -> str:
+    """Order details shown to the customer"""
+    items_text = "\n".join(
         f"  • {item['name']} × {item['quantity']} = {item['price'] * item['quantity']}₽"
         for item in order['items']
-    ])
-    
-    order_text = (
+    )
+    bonus_text = (
+        f"\n🎁 Использовано бонусов: {order['bonus_used']}₽" if order['bonus_used'] > 0 else ""
+    )
+    return (
         f"📦 <b>Заказ #{order['id']}</b>\n\n"
         f"📍 Адрес: {order['delivery_address']}\n"
         f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n\n"
         f"🍽 <b>Состав заказа:</b>\n{items_text}\n\n"
-        f"💰 <b>Итого: {order['total_price']}₽</b>"
+        f"💰 <b>Итого: {order['total_price']}₽</b>{bonus_text}"
     )
-    
-    if order['bonus_used'] > 0:
-        order_text += f"\n🎁 Использовано бонусов: {order['bonus_used']}₽"
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_order_status_keyboard(order_id, order['status'])
-    )
-    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("refresh_order:"))
-async def refresh_order_callback(callback: CallbackQuery):
-    """Refresh order status"""
-    order_id = int(callback.data.split(":")[1])
-    order = get_order(order_id)
-    
+# Customer order buttons ("<action>:<order_id>"), parsed by one handler and
+# dispatched by a dict lookup on the action
+_ORDER_ACTIONS: Dict[str, Callable[[CallbackQuery, int], Awaitable[Any]]] = {}
+
+
+def _order_action(name: str):
+    """Register a handler for the <name>:<order_id> buttons"""
+    def register(handler):
+        _ORDER_ACTIONS[name] = handler
+        return handler
+    return register
+
+
+@router.callback_query(F.data.regexp(r"^(\w+):(\d+)$").as_("match"))
+async def order_action_callback(callback: CallbackQuery, match: re.Match):
+    """Route an order button to its handler"""
+    action, order_id = match.groups()
+    handler = _ORDER_ACTIONS.get(action)
+    if handler is None:
+        await callback.answer()
+        return
+    await handler(callback, int(order_id))
+
+
+async def _show_order(callback: CallbackQuery, order_id: int, answer_text: str = None):
+    """Show order card, skipping the edit when the message already shows it"""
+    order = await get_order(order_id)
     if not order:
         await callback.answer("Заказ не найден", show_alert=True)
         return
     
-    # Format items
-    items_text = "\n".join([
-        f"  • {item['name']} × {item['quantity']} = {item['price'] * item['quantity']}₽"
-        for item in order['items']
-    ])
-    
-    order_text = (
-        f"📦 <b>Заказ #{order['id']}</b>\n\n"
-        f"📍 Адрес: {order['delivery_address']}\n"
-        f"📊 Статус: {STATUS_NAMES.get(order['status'], order['status'])}\n\n"
-        f"🍽 <b>Состав заказа:</b>\n{items_text}\n\n"
-        f"💰 <b>Итого: {order['total_price']}₽</b>"
+    text = _format_order_text(order)
+    await edit_if_changed(
+        callback.message, text, hashlib.sha1(text.encode()).hexdigest(),
+        get_order_status_keyboard(order_id, order['status'])
     )
-    
-    await callback.message.edit_text(
-        order_text,
-        parse_mode="HTML",
-        reply_markup=get_order_status_keyboard(order_id, order['status'])
-    )
-    await callback.answer("Статус обновлён ✅")
+    await callback.answer(answer_text)
+
+
+@_order_action("view_order")
+async def view_order_callback(callback: CallbackQuery, order_id: int):
+    """View order details"""
+    await _show_order(callback, order_id)
+
+
+@_order_action("refresh_order")
+async def refresh_order_callback(callback: CallbackQuery, order_id: int):
+    """Refresh order status; an unchanged status costs no edit"""
+    await _show_order(callback, order_id, "Статус обновлён ✅")
 
 
-@router.callback_query(F.data.startswith("cancel_order:"))
-async def cancel_order_callback(callback: CallbackQuery):
+@_order_action("cancel_order")
+async def cancel_order_callback(callback: CallbackQuery, order_id: int):
     """Cancel order"""
-    order_id = int(callback.data.split(":")[1])
-    order = get_order(order_id)
-    
-    if not order:
-        await callback.answer("Заказ не найден", show_alert=True)
-        return
-    
-    if order['status'] != 'pending':
+    # Status check and update in one statement, so repeated taps cannot race
+    if not await cancel_order_if_pending(order_id):
         await callback.answer("Заказ уже нельзя отменить", show_alert=True)
         return
     
-    update_order_status(order_id, 'cancelled')
-    
     await callback.message.edit_text(
         f"❌ Заказ #{order_id} отменён.\n\n"
         f"Если были использованы бонусы, они будут возвращены на баланс.",
@@ -280,24 +298,16 @@ async def cancel_order_callback(callback: CallbackQuery):
 @router.message(F.text == "📞 Контакты")
 async def contacts_handler(message: Message):
     """Show contacts"""
-    await message.answer(
-        "📞 <b>Контакты</b>\n\n"
-        "📍 Адрес: г. Москва, ул. Примерная, д. 1\n"
-        "📱 Телефон: +7 (999) 123-45-67\n"
-        "⏰ Время работы: 09:00 - 23:00\n\n"
-        "📲 Наш канал: @your_channel\n"
-        "💬 Поддержка: @your_support",
-        parse_mode="HTML"
-    )
+    await message.answer(_CONTACTS_TEXT, parse_mode="HTML")
 
 
 @router.message(F.web_app_data)
 async def web_app_data_handler(message: Message):
     """Handle data from Web App"""
-    from database import get_users_by_role, get_order as get_order_details
+    from db_async import get_users_by_role, get_order as get_order_details
     
     try:
-        data = json.loads(message.web_app_data.data)
+        data = orjson.loads(message.web_app_data.data)
         
         if data.get('action') == 'order_created':
             order_id = data.get('order_id')
@@ -313,9 +323,9 @@ async def web_app_data_handler(message: Message):
             )
             
             # Уведомление всем админам и директору о новом заказе
-            order_details = get_order_details(order_id)
-            admins = get_users_by_role('admin')
-            directors = get_users_by_role('director')
+            order_details = await get_order_details(order_id)
+            admins = await get_users_by_role('admin')
+            directors = await get_users_by_role('director')
             staff = admins + directors
             
             if order_details:
@@ -333,36 +343,28 @@ async def web_app_data_handler(message: Message):
                     f"Используйте /admin для управления заказами."
                 )
                 
-                bot = message.bot
                 for admin in staff:
-                    try:
-                        await bot.send_message(
-                            admin['telegram_id'],
-                            notification_text,
-                            parse_mode="HTML"
-                        )
-                    except Exception as e:
-                        print(f"Failed to notify admin {admin['telegram_id']}: {e}")
+                    await notify(admin['telegram_id'], notification_text, parse_mode="HTML")
         
         elif data.get('action') == 'address_updated':
             address = data.get('address')
-            update_user_address(message.from_user.id, address)
+            await update_user_address(message.from_user.id, address)
             await message.answer(f"📍 Адрес доставки обновлён:\n{address}")
             
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         pass
     except Exception as e:
-        print(f"Web App data error: {e}")
+        logger.warning("Web App data error: %s", e)
 
 
 @router.message(F.contact)
 async def contact_handler(message: Message, state: FSMContext):
     """Handle shared contact"""
     phone = message.contact.phone_number
-    update_user_phone(message.from_user.id, phone)
+    await update_user_phone(message.from_user.id, phone)
     
     await state.clear()
-    user = get_user(message.from_user.id)
+    user = await get_user(message.from_user.id)
     role = user.get('role', 'user') if user else 'user'
     await message.answer(
         f"✅ Номер телефона сохранён: {phone}",
@@ -405,11 +407,23 @@ async def manage_roles_button(message: Message):
     )
 
 
+@router.message(Command("director"))
+async def director_command_denied(message: Message):
+    """/director from anyone but the director (the director router takes theirs)"""
+    await message.answer("⛔ Эта команда доступна только директору")
+
+
+@router.callback_query(F.data.startswith(("director:", "admin:director_add_category:")))
+async def director_button_denied(callback: CallbackQuery):
+    """Director panel button pressed by someone else"""
+    await callback.answer(DENIED_TEXT, show_alert=True)
+
+
 @router.message(F.text == "🛠 Админ-панель")
 async def admin_panel_button(message: Message):
     """Admin panel button handler"""
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in ADMIN_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
@@ -424,14 +438,14 @@ async def admin_panel_button(message: Message):
 @router.message(F.text == "📋 Заказы")
 async def orders_button(message: Message):
     """Orders button for admin/director"""
-    from database import get_pending_orders
+    from db_async import get_pending_orders
     
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in ADMIN_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
-    orders = get_pending_orders()
+    orders = await get_pending_orders(limit=10)
     
     if not orders:
         await message.answer(
@@ -454,14 +468,14 @@ async def orders_button(message: Message):
     
     orders_text = "📋 <b>Активные заказы:</b>\n\n"
     
-    for order in orders[:10]:
+    for order in orders:
         emoji = STATUS_EMOJI.get(order['status'], '❓')
         orders_text += (
             f"{emoji} #{order['id']} | {order.get('first_name', 'Клиент')} | {order['total_price']}₽\n"
         )
         builder.button(
             text=f"#{order['id']} - {order['total_price']}₽",
-            callback_data=f"admin:view_order:{order['id']}"
+            callback_data=OrderViewCB(order_id=order['id'])
         )
     
     builder.adjust(1)
@@ -478,8 +492,8 @@ async def edit_menu_button(message: Message):
     """Edit menu button for admin"""
     from keyboards import get_menu_edit_keyboard
     
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in ADMIN_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
@@ -494,38 +508,22 @@ async def edit_menu_button(message: Message):
 @router.message(F.text == "📊 Статистика")
 async def stats_button(message: Message):
     """Statistics button for admin/director"""
-    from database import get_connection
+    from db_async import get_order_stats
     
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in ADMIN_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM orders")
-        total_orders = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE date(created_at) = date('now')")
-        today_orders = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COALESCE(SUM(total_price), 0) FROM orders WHERE status = 'delivered'")
-        total_revenue = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total_users = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status NOT IN ('delivered', 'cancelled')")
-        active_orders = cursor.fetchone()[0]
+    stats = await get_order_stats()
     
     await message.answer(
         "📊 <b>Статистика</b>\n\n"
-        f"👥 Всего пользователей: {total_users}\n"
-        f"📦 Всего заказов: {total_orders}\n"
-        f"📦 Заказов сегодня: {today_orders}\n"
-        f"⏳ Активных заказов: {active_orders}\n"
-        f"💰 Общая выручка: {total_revenue}₽",
+        f"👥 Всего пользователей: {stats['total_users']}\n"
+        f"📦 Всего заказов: {stats['total_orders']}\n"
+        f"📦 Заказов сегодня: {stats['today_orders']}\n"
+        f"⏳ Активных заказов: {stats['active_orders']}\n"
+        f"💰 Общая выручка: {stats['total_revenue']}₽",
         parse_mode="HTML"
     )
 
@@ -533,14 +531,14 @@ async def stats_button(message: Message):
 @router.message(F.text == "🚚 Мои доставки")
 async def courier_deliveries_button(message: Message):
     """Courier deliveries button"""
-    from database import get_courier_orders
+    from db_async import get_courier_orders
     
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('courier', 'admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in COURIER_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
-    orders = get_courier_orders(message.from_user.id)
+    orders = await get_courier_orders(message.from_user.id)
     
     if not orders:
         await message.answer(
@@ -564,7 +562,7 @@ async def courier_deliveries_button(message: Message):
         )
         builder.button(
             text=f"{status_emoji} #{order['id']} - {order['total_price']}₽",
-            callback_data=f"courier:view:{order['id']}"
+            callback_data=CourierCB(action="view", order_id=order['id'])
         )
     
     builder.adjust(1)
@@ -585,24 +583,14 @@ async def courier_active_orders_button(message: Message):
 @router.message(F.text == "✅ Завершённые")
 async def courier_completed_button(message: Message):
     """Show completed deliveries for courier"""
-    from database import get_connection
+    from db_async import get_courier_delivered_orders
     
-    user = get_user(message.from_user.id)
-    if not user or user['role'] not in ('courier', 'admin', 'director'):
+    user = await get_user(message.from_user.id)
+    if not user or user['role'] not in COURIER_ROLES:
         await message.answer("⛔ Доступ запрещён")
         return
     
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT o.*, u.first_name
-            FROM orders o
-            JOIN users u ON o.user_id = u.telegram_id
-            WHERE o.courier_id = ? AND o.status = 'delivered'
-            ORDER BY o.updated_at DESC
-            LIMIT 10
-        """, (message.from_user.id,))
-        orders = [dict(row) for row in cursor.fetchall()]
+    orders = await get_courier_delivered_orders(message.from_user.id, limit=10)
     
     if not orders:
         await message.answer(
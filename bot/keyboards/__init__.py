@@ -9,9 +9,12 @@ from aiogram.types import (
     WebAppInfo
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
+from functools import lru_cache
 import os
 
+from callbacks import OrderStatusCB, AssignCourierCB, CourierCB
+
 
 def get_webapp_url() -> str:
     """Get Web App URL from environment"""
@@ -103,6 +106,9 @@ def get_share_phone_keyboard() -> ReplyKeyboardMarkup:
     return keyboard
 
 
+# Shown on every view and refresh of an order, so built once per order and
+# status; the markup is shared, don't mutate it
+@lru_cache(maxsize=1024)
 def get_order_status_keyboard(order_id: int, status: str) -> InlineKeyboardMarkup:
     """Order status inline keyboard for user"""
     builder = InlineKeyboardBuilder()
@@ -142,6 +148,9 @@ def get_user_orders_keyboard(orders: List[Dict]) -> InlineKeyboardMarkup:
 
 # ============ DIRECTOR KEYBOARDS ============
 
+# Static keyboards are built once and the same markup object is reused; don't mutate them
+
+@lru_cache(maxsize=1)
 def get_director_panel_keyboard() -> InlineKeyboardMarkup:
     """Director control panel"""
     builder = InlineKeyboardBuilder()
@@ -160,6 +169,7 @@ def get_director_panel_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_director_staff_keyboard() -> InlineKeyboardMarkup:
     """Director staff management submenu"""
     builder = InlineKeyboardBuilder()
@@ -174,6 +184,7 @@ def get_director_staff_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=1)
 def get_director_menu_management_keyboard() -> InlineKeyboardMarkup:
     """Director menu management submenu"""
     builder = InlineKeyboardBuilder()
@@ -220,7 +231,18 @@ def get_dish_edit_keyboard(item_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_role_list_keyboard(users: List[Dict], action: str = "remove") -> InlineKeyboardMarkup:
+def get_confirm_delete_dish_keyboard(item_id: int) -> InlineKeyboardMarkup:
+    """Confirm dish deletion keyboard"""
+    builder = InlineKeyboardBuilder()
+    
+    builder.button(text="✅ Да, удалить", callback_data=f"director:do_delete_dish:{item_id}")
+    builder.button(text="❌ Отмена", callback_data="director:delete_dish")
+    
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+def get_role_list_keyboard(users: Iterable[Dict], action: str = "remove") -> InlineKeyboardMarkup:
     """List users with roles for management"""
     builder = InlineKeyboardBuilder()
     
@@ -285,7 +307,7 @@ def get_order_manage_keyboard(order_id: int, status: str, couriers: List[Dict] =
     }
     
     for text, new_status in status_actions.get(status, []):
-        builder.button(text=text, callback_data=f"admin:order_status:{order_id}:{new_status}")
+        builder.button(text=text, callback_data=OrderStatusCB(order_id=order_id, status=new_status))
     
     # Add courier assignment for ready orders
     if status == 'cooking' or status == 'ready':
@@ -294,7 +316,7 @@ def get_order_manage_keyboard(order_id: int, status: str, couriers: List[Dict] =
                 name = courier.get('first_name') or str(courier['telegram_id'])
                 builder.button(
                     text=f"🚚 {name}",
-                    callback_data=f"admin:assign_courier:{order_id}:{courier['telegram_id']}"
+                    callback_data=AssignCourierCB(order_id=order_id, courier_id=courier['telegram_id'])
                 )
     
     builder.button(text="🔙 Назад", callback_data="admin:orders")
@@ -367,12 +389,12 @@ def get_courier_order_keyboard(order_id: int, status: str) -> InlineKeyboardMark
     builder = InlineKeyboardBuilder()
     
     if status == 'ready':
-        builder.button(text="📦 Забрал заказ", callback_data=f"courier:pickup:{order_id}")
+        builder.button(text="📦 Забрал заказ", callback_data=CourierCB(action="pickup", order_id=order_id))
     elif status == 'delivering':
-        builder.button(text="✅ Доставил", callback_data=f"courier:delivered:{order_id}")
+        builder.button(text="✅ Доставил", callback_data=CourierCB(action="delivered", order_id=order_id))
     
-    builder.button(text="📍 Показать адрес", callback_data=f"courier:address:{order_id}")
-    builder.button(text="📞 Позвонить клиенту", callback_data=f"courier:call:{order_id}")
+    builder.button(text="📍 Показать адрес", callback_data=CourierCB(action="address", order_id=order_id))
+    builder.button(text="📞 Позвонить клиенту", callback_data=CourierCB(action="call", order_id=order_id))
     builder.button(text="🔙 Назад", callback_data="courier:orders")
     
     builder.adjust(1)
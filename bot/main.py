@@ -4,9 +4,12 @@ Aiogram 3.x bot with Web App integration
 """
 
 import asyncio
+import atexit
 import logging
+import queue
 import sys
 import os
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 # Add parent directory to path for imports
@@ -16,21 +19,30 @@ from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 # Load environment variables
 load_dotenv()
 
 # Import handlers
 from handlers import user_router, admin_router, director_router, courier_router
+from middlewares import RoleMiddleware
+from notifier import start_notifier, stop_notifier
 
 # Import database initialization
 from database import init_db, DIRECTOR_ID
 
-# Configure logging
+# Configure logging; records are written out by a listener thread, so
+# handlers logging on the event loop never wait on console I/O
+_log_queue = queue.SimpleQueue()
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 
@@ -56,7 +68,16 @@ async def main():
     )
     
     # Initialize dispatcher
-    dp = Dispatcher()
+    # One update at a time per chat/user, so rapid input cannot race an FSM step
+    dp = Dispatcher(events_isolation=SimpleEventIsolation())
+    
+    # Resolve sender role once per update for all routers
+    dp.message.middleware(RoleMiddleware())
+    dp.callback_query.middleware(RoleMiddleware())
+    
+    # Queued customer/staff notifications are sent by a paced background worker
+    dp.startup.register(start_notifier)
+    dp.shutdown.register(stop_notifier)
     
     # Register routers
     dp.include_router(director_router)  # Director first (highest priority)
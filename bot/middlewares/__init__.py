@@ -0,0 +1,7 @@
+"""
+Middlewares module for Telegram Cafe Bot
+"""
+
+from .role_cache import RoleMiddleware, invalidate_role
+
+__all__ = ['RoleMiddleware', 'invalidate_role']
@@ -0,0 +1,58 @@
+"""
+Role middleware for Telegram Cafe Bot
+Resolves the sender's role once per update and keeps it in a short-lived cache
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from db_async import get_user, DIRECTOR_ID
+
+ROLE_TTL = 30
+ROLE_CACHE_SIZE = 4096
+
+# user_id -> (role, resolved_at)
+_cache: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+
+def invalidate_role(user_id: int):
+    """Forget the cached role, e.g. after the director changes it"""
+    _cache.pop(user_id, None)
+
+
+async def resolve_role(user_id: int) -> str:
+    """Get user role, hitting the database at most once per ROLE_TTL"""
+    if user_id == DIRECTOR_ID:
+        return 'director'
+    
+    now = time.monotonic()
+    cached = _cache.get(user_id)
+    if cached and now - cached[1] < ROLE_TTL:
+        _cache.move_to_end(user_id)
+        return cached[0]
+    
+    user = await get_user(user_id)
+    role = user['role'] if user else 'user'
+    _cache[user_id] = (role, now)
+    _cache.move_to_end(user_id)
+    if len(_cache) > ROLE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return role
+
+
+class RoleMiddleware(BaseMiddleware):
+    """Passes the sender's role to handlers as the `role` argument"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        data["role"] = await resolve_role(user.id) if user else 'user'
+        return await handler(event, data)
@@ -0,0 +1,88 @@
+"""
+Outgoing notifications for Telegram Cafe Bot
+Messages to customers, couriers and staff are queued by handlers and sent by
+one background worker, paced below Telegram's ~30 messages/second bot limit
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+SEND_RATE = 28          # messages per second, a little under Telegram's limit
+QUEUE_SIZE = 1000       # handlers wait for room once this many are pending
+MAX_ATTEMPTS = 3        # sends retried after flood-control waits
+STOP_TIMEOUT = 10       # seconds to flush the queue on shutdown
+
+logger = logging.getLogger(__name__)
+
+# (chat_id, text, send_message kwargs); created in the bot's event loop
+_queue: "Optional[asyncio.Queue[Tuple[int, str, Dict[str, Any]]]]" = None
+_worker: Optional[asyncio.Task] = None
+
+
+def _get_queue() -> "asyncio.Queue[Tuple[int, str, Dict[str, Any]]]":
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(QUEUE_SIZE)
+    return _queue
+
+
+async def notify(chat_id: int, text: str, **kwargs):
+    """Queue a message; returns as soon as it is queued"""
+    await _get_queue().put((chat_id, text, kwargs))
+
+
+async def _send(bot: Bot, chat_id: int, text: str, kwargs: Dict[str, Any]):
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            await bot.send_message(chat_id, text, **kwargs)
+            return
+        except TelegramRetryAfter as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def _notification_worker(bot: Bot, queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    interval = 1 / SEND_RATE
+    next_at = 0.0
+
+    while True:
+        chat_id, text, kwargs = await queue.get()
+        try:
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_at = max(next_at, loop.time()) + interval
+            await _send(bot, chat_id, text, kwargs)
+        except Exception as e:
+            logger.warning("Failed to notify %s: %s", chat_id, e)
+        finally:
+            queue.task_done()
+
+
+async def start_notifier(bot: Bot):
+    """Dispatcher startup hook: run the sender for this bot"""
+    global _queue, _worker
+    if _worker is not None and _worker.get_loop() is not asyncio.get_running_loop():
+        # Left over from a previous event loop (e.g. polling restarted)
+        _queue = _worker = None
+    if _worker is None or _worker.done():
+        _worker = asyncio.create_task(_notification_worker(bot, _get_queue()))
+
+
+async def stop_notifier():
+    """Dispatcher shutdown hook: flush pending messages, then stop the sender"""
+    global _queue, _worker
+    if _worker is None:
+        return
+    try:
+        await asyncio.wait_for(_queue.join(), STOP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Notifier stopped with %d messages unsent", _queue.qsize())
+    _worker.cancel()
+    _queue = _worker = None
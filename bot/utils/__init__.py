@@ -0,0 +1,9 @@
+"""
+Utilities module for Telegram Cafe Bot
+"""
+
+from .order_render import format_order_card
+from .message_edit import edit_if_changed
+from .calls import gather_calls
+
+__all__ = ['format_order_card', 'edit_if_changed', 'gather_calls']
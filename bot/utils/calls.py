@@ -0,0 +1,17 @@
+"""
+Concurrent Telegram API calls for Telegram Cafe Bot
+"""
+
+import asyncio
+from typing import Any, Awaitable, List
+
+
+async def _wait(call: Awaitable[Any]) -> Any:
+    return await call
+
+
+async def gather_calls(*calls: Awaitable[Any]) -> List[Any]:
+    """Await independent API calls at once, e.g. an edit and the callback answer.
+    aiogram method objects (message.edit_text(), callback.answer(), ...) are
+    awaitable but unhashable, which asyncio.gather rejects, so each is wrapped"""
+    return await asyncio.gather(*(_wait(call) for call in calls))
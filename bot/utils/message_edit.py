@@ -0,0 +1,47 @@
+"""
+Message edits for Telegram Cafe Bot
+Redraws a bot message only when its text or keyboard would actually change
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+SENT_CACHE_SIZE = 1024
+
+# (chat_id, message_id) -> digest of the text last sent to that message
+_sent: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+
+
+def _same_markup(current: Optional[InlineKeyboardMarkup],
+                 new: Optional[InlineKeyboardMarkup]) -> bool:
+    """Compare keyboards by content; markups received from Telegram carry bot context"""
+    if current is None or new is None:
+        return current is new
+    return current.model_dump(exclude_none=True) == new.model_dump(exclude_none=True)
+
+
+async def edit_if_changed(message: Message, text: str, digest: str,
+                          reply_markup: Optional[InlineKeyboardMarkup] = None) -> bool:
+    """Edit message to show text (HTML) and keyboard, skipping the API call if it
+    already shows them. digest identifies the text, e.g. its sha1.
+    Returns True if the message was edited"""
+    key = (message.chat.id, message.message_id)
+    # The keyboard check guards against the message having been switched to
+    # another view since this text was last sent
+    if _sent.get(key) == digest and _same_markup(message.reply_markup, reply_markup):
+        return False
+    
+    try:
+        await message.edit_text(text, parse_mode="HTML", reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    
+    _sent[key] = digest
+    _sent.move_to_end(key)
+    if len(_sent) > SENT_CACHE_SIZE:
+        _sent.popitem(last=False)
+    return True
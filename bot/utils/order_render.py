@@ -0,0 +1,73 @@
+"""
+Order card rendering for Telegram Cafe Bot
+Builds the order card shown to admins and couriers
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+ITEMS_CACHE_SIZE = 1024
+
+# (order_id, for_courier) -> rendered item lines; order items never change after checkout
+_items_text: "OrderedDict[Tuple[int, bool], str]" = OrderedDict()
+
+
+def _render_items(order: Dict[str, Any], for_courier: bool) -> str:
+    """Item lines of the order card, rendered once per order"""
+    key = (order['id'], for_courier)
+    text = _items_text.get(key)
+    if text is not None:
+        _items_text.move_to_end(key)
+        return text
+    
+    if for_courier:
+        text = "\n".join(
+            f"  • {item['name']} × {item['quantity']}"
+            for item in order['items']
+        )
+    else:
+        text = "\n".join(
+            f"  • {item['name']} × {item['quantity']} = {item['price'] * item['quantity']}₽"
+            for item in order['items']
+        )
+    
+    _items_text[key] = text
+    if len(_items_text) > ITEMS_CACHE_SIZE:
+        _items_text.popitem(last=False)
+    return text
+
+
+def format_order_card(order: Dict[str, Any], status_names: Mapping[str, str], *,
+                      for_courier: bool = False,
+                      courier_name: Optional[str] = None) -> Tuple[str, str]:
+    """Render order card, returns (text, sha1 of text)"""
+    status = status_names.get(order['status'], order['status'])
+    items_text = _render_items(order, for_courier)
+    
+    if for_courier:
+        text = (
+            f"📦 <b>Заказ #{order['id']}</b>\n\n"
+            f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
+            f"📱 Телефон: {order.get('phone', 'Не указан')}\n"
+            f"📍 Адрес: {order['delivery_address']}\n\n"
+            f"📊 Статус: {status}\n\n"
+            f"🍽 <b>Состав:</b>\n{items_text}\n\n"
+            f"💰 <b>Сумма: {order['total_price']}₽</b>\n"
+            f"💳 Оплата: {'✅ Оплачен' if order['payment_status'] == 'paid' else '💵 При получении'}"
+        )
+    else:
+        text = (
+            f"📦 <b>Заказ #{order['id']}</b>\n\n"
+            f"👤 Клиент: {order.get('first_name', 'Неизвестно')}\n"
+            f"📱 Телефон: {order.get('phone', 'Не указан')}\n"
+            f"📍 Адрес: {order['delivery_address']}\n\n"
+            f"📊 Статус: {status}\n"
+            f"💳 Оплата: {'✅ Оплачен' if order['payment_status'] == 'paid' else '⏳ Ожидает'}\n\n"
+            f"🍽 <b>Состав:</b>\n{items_text}\n\n"
+            f"💰 <b>Итого: {order['total_price']}₽</b>"
+        )
+        if courier_name:
+            text += f"\n🚚 Курьер: {courier_name}"
+    
+    return text, hashlib.sha1(text.encode()).hexdigest()
@@ -4,10 +4,13 @@ Runs both services in one process for Render deployment
 """
 
 import asyncio
+import atexit
 import logging
+import queue
 import os
 import sys
 import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 # Get the directory where this script is located
@@ -21,11 +24,17 @@ sys.path.insert(0, str(BASE_DIR / "webapp"))
 from dotenv import load_dotenv
 load_dotenv(BASE_DIR / ".env")
 
-# Configure logging
+# Configure logging; records are written out by a listener thread, so
+# handlers logging on the event loop never wait on console I/O
+_log_queue = queue.SimpleQueue()
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 
@@ -47,9 +56,12 @@ async def run_bot():
     from aiogram import Bot, Dispatcher
     from aiogram.enums import ParseMode
     from aiogram.client.default import DefaultBotProperties
+    from aiogram.fsm.storage.memory import SimpleEventIsolation
     
     # Direct imports since bot/ is in path
     from handlers import user_router, admin_router, director_router, courier_router
+    from middlewares import RoleMiddleware
+    from notifier import start_notifier, stop_notifier
     from database import init_db, DIRECTOR_ID
     
     bot_token = os.getenv("BOT_TOKEN")
@@ -68,7 +80,12 @@ async def run_bot():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    dp = Dispatcher()
+    # One update at a time per chat/user, so rapid input cannot race an FSM step
+    dp = Dispatcher(events_isolation=SimpleEventIsolation())
+    dp.message.middleware(RoleMiddleware())
+    dp.callback_query.middleware(RoleMiddleware())
+    dp.startup.register(start_notifier)
+    dp.shutdown.register(stop_notifier)
     dp.include_router(director_router)
     dp.include_router(admin_router)
     dp.include_router(courier_router)
@@ -27,7 +27,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import database functions
-from database import (
+from db_async import (
     get_user, create_user, update_user_address,
     get_categories, get_menu_items, get_menu_item,
     get_stories, create_order, get_order, get_user_orders,
@@ -181,10 +181,10 @@ async def health_check():
 @app.get("/api/user/{user_id}")
 async def get_user_info(user_id: int):
     """Get user information"""
-    user = get_user(user_id)
+    user = await get_user(user_id)
     if not user:
         # Create new user
-        user = create_user(user_id, welcome_bonus=500)
+        user = await create_user(user_id, welcome_bonus=500)
     
     return {
         "id": user["telegram_id"],
@@ -199,15 +199,15 @@ async def get_user_info(user_id: int):
 @app.get("/api/categories")
 async def get_menu_categories():
     """Get all menu categories"""
-    categories = get_categories()
+    categories = await get_categories()
     return {"categories": categories}
 
 
 @app.get("/api/menu")
 async def get_full_menu(category_id: Optional[int] = None):
     """Get menu items, optionally filtered by category"""
-    items = get_menu_items(category_id)
-    categories = get_categories()
+    items = await get_menu_items(category_id)
+    categories = await get_categories()
     
     # Group items by category
     menu_by_category = {}
@@ -234,7 +234,7 @@ async def get_full_menu(category_id: Optional[int] = None):
 @app.get("/api/menu/{item_id}")
 async def get_menu_item_detail(item_id: int):
     """Get single menu item details"""
-    item = get_menu_item(item_id)
+    item = await get_menu_item(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
@@ -243,16 +243,16 @@ async def get_menu_item_detail(item_id: int):
 @app.get("/api/stories")
 async def get_promo_stories():
     """Get stories/promotions"""
-    stories = get_stories()
+    stories = await get_stories()
     return {"stories": stories}
 
 
 @app.post("/api/order")
 async def create_new_order(order: OrderCreate):
     """Create new order"""
-    user = get_user(order.user_id)
+    user = await get_user(order.user_id)
     if not user:
-        user = create_user(order.user_id, welcome_bonus=500)
+        user = await create_user(order.user_id, welcome_bonus=500)
     
     # Calculate total
     total = sum(item.price * item.quantity for item in order.items)
@@ -268,13 +268,18 @@ async def create_new_order(order: OrderCreate):
         
         max_bonus = min(total // 2, user.get("balance_bonus", 0), order.use_bonus)
         if max_bonus > 0:
-            use_user_bonus(order.user_id, max_bonus)
+            # The balance may have been spent since it was read; charge nothing then
+            if not await use_user_bonus(order.user_id, max_bonus):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Баланс бонусов изменился, попробуйте ещё раз"
+                )
             bonus_used = max_bonus
             total -= bonus_used
     
     # Update address
     if order.address:
-        update_user_address(order.user_id, order.address)
+        await update_user_address(order.user_id, order.address)
     
     # Create order
     items_data = [
@@ -282,7 +287,7 @@ async def create_new_order(order: OrderCreate):
         for item in order.items
     ]
     
-    order_id = create_order(
+    order_id = await create_order(
         user_id=order.user_id,
         items=items_data,
         total_price=total,
@@ -303,14 +308,14 @@ async def create_new_order(order: OrderCreate):
 @app.get("/api/orders/{user_id}")
 async def get_user_orders_list(user_id: int, limit: int = 10):
     """Get user's order history"""
-    orders = get_user_orders(user_id, limit)
+    orders = await get_user_orders(user_id, limit)
     return {"orders": orders}
 
 
 @app.get("/api/order/{order_id}")
 async def get_order_detail(order_id: int):
     """Get order details"""
-    order = get_order(order_id)
+    order = await get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order